@@ -1,168 +1,225 @@
-import numpy as np
-from PIL import Image, ImageDraw
-import random
 import math
 import os
+from functools import partial
+
+from frame_pool import image_from
+from gif_writer import write_gif_scales
+from instrument import stage
+from layers import blank_canvas, place_sprite
+from render_cache import cached_render
+from render_farm import imap_frames
 
 # Config
 CANVAS_SIZE = 64
 SCALE = 8
 OUTPUT_DIR = "animal_pixels"
 
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
-
 # Palette
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 BG_COLOR = (200, 220, 255) # Light Blue
 
+# Color variants: name -> colors passed to the parts (the first entry is the default)
+CAT_PALETTES = {
+    "orange": ((255, 165, 0), (200, 100, 0)),   # Fur, Tail
+    "grey": ((160, 160, 170), (110, 110, 120)),
+    "black": ((40, 40, 50), (20, 20, 25)),
+}
+RABBIT_PALETTES = {
+    "white": ((250, 250, 250), (255, 192, 203)),  # Fur, Inner ear / Nose
+    "brown": ((170, 120, 80), (230, 170, 160)),
+}
+DOG_PALETTES = {
+    "beagle": ((139, 69, 19), (255, 255, 255)),   # Patches, Coat
+    "black": ((40, 30, 30), (240, 240, 240)),
+}
+
 # --- Utilities ---
 def create_canvas():
-    return Image.new('RGB', (CANVAS_SIZE, CANVAS_SIZE), BG_COLOR)
-
-def save_gif(frames, filename, duration=150):
-    # Scale up using Nearest Neighbor to preserve pixel look
-    scaled_frames = [f.resize((CANVAS_SIZE * SCALE, CANVAS_SIZE * SCALE), Image.NEAREST) for f in frames]
-    scaled_frames[0].save(
-        f"{OUTPUT_DIR}/{filename}",
-        save_all=True,
-        append_images=scaled_frames[1:],
-        duration=duration,
-        loop=0
-    )
+    return blank_canvas((CANVAS_SIZE, CANVAS_SIZE), BG_COLOR)
+
+def variant_filename(filename, palette, palettes):
+    # The default palette keeps the plain filename; others get a _<palette> suffix
+    if palette is not None and palette not in palettes:
+        raise ValueError(f"Unknown palette '{palette}', choose from: {', '.join(palettes)}")
+    if palette is None or palette == next(iter(palettes)):
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{palette}{ext}"
+
+def save_gif(frames, filename, duration=150, scales=None, output_dir=None):
+    # Scale up using Nearest Neighbor to preserve pixel look, done inside the encoder so frames
+    # stay at native resolution. The first scale gets `filename`; extra scales are
+    # written from the same render as <name>_<scale>x.gif. Frames are streamed,
+    # so any iterable works.
+    # One shared palette plus changed-region-only frames: loops barely change
+    # between frames (blinks, wags), so most frames shrink to a few pixels.
+    output_dir = output_dir or OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    scales = scales or (SCALE,)
+    stem, ext = os.path.splitext(filename)
+    paths = {s: os.path.join(output_dir, filename if s == scales[0] else f"{stem}_{s}x{ext}")
+             for s in scales}
+    write_gif_scales(paths, frames, duration=duration, optimize=True, colors=(BG_COLOR, WHITE, BLACK))
     print(f"Generated {filename}")
 
+# Every body part below is a sprite: drawn around (x, y), rasterized once per
+# variant (colors, pose) and blitted into each frame with place_sprite.
+
 # --- 1. Cat (Orange Tabby) ---
-def generate_cat():
-    frames = []
-    num_frames = 10
+def cat_body(draw, x, y, fur):
+    # Body
+    draw.rectangle([x+20, y+30, x+44, y+50], fill=fur)
+    # Head
+    draw.rectangle([x+22, y+18, x+42, y+32], fill=fur)
+    # Ears
+    draw.polygon([(x+22, y+18), (x+25, y+10), (x+28, y+18)], fill=fur) # Left
+    draw.polygon([(x+36, y+18), (x+39, y+10), (x+42, y+18)], fill=fur) # Right
+
+def cat_eyes(draw, x, y, closed):
+    if closed: # Blink
+        draw.line([x+25, y+24, x+28, y+24], fill=BLACK, width=1)
+        draw.line([x+36, y+24, x+39, y+24], fill=BLACK, width=1)
+    else:
+        draw.rectangle([x+25, y+23, x+27, y+25], fill=BLACK)
+        draw.rectangle([x+36, y+23, x+38, y+25], fill=BLACK)
+
+def cat_nose(draw, x, y):
+    draw.rectangle([x+31, y+27, x+33, y+28], fill="pink")
+
+def cat_tail(draw, x, y, tip, color):
+    # Simple tail curve
+    draw.line([x+44, y+45, x+tip, y+40], fill=color, width=3)
+
+def draw_cat(f, num_frames=10, palette=None):
+    fur, tail = CAT_PALETTES[palette or next(iter(CAT_PALETTES))]
     
-    ORANGE = (255, 165, 0)
-    DARK_ORANGE = (200, 100, 0)
+    with stage("background"):
+        pixels = create_canvas()
     
-    for f in range(num_frames):
-        img = create_canvas()
-        draw = ImageDraw.Draw(img)
-        
-        # Body
-        draw.rectangle([20, 30, 44, 50], fill=ORANGE)
-        
-        # Head
-        draw.rectangle([22, 18, 42, 32], fill=ORANGE)
-        
-        # Ears
-        draw.polygon([(22, 18), (25, 10), (28, 18)], fill=ORANGE) # Left
-        draw.polygon([(36, 18), (39, 10), (42, 18)], fill=ORANGE) # Right
-        
+    with stage("shapes"):
+        place_sprite(pixels, cat_body, 0, 0, fur)
         # Eyes (Blink)
-        if f in [4, 5]: # Blink
-            draw.line([25, 24, 28, 24], fill=BLACK, width=1)
-            draw.line([36, 24, 39, 24], fill=BLACK, width=1)
-        else:
-            draw.rectangle([25, 23, 27, 25], fill=BLACK)
-            draw.rectangle([36, 23, 38, 25], fill=BLACK)
-            
-        # Nose
-        draw.rectangle([31, 27, 33, 28], fill="pink")
-        
+        place_sprite(pixels, cat_eyes, 0, 0, f in [4, 5])
+        place_sprite(pixels, cat_nose, 0, 0)
         # Tail (Wag)
         offset = math.sin(f / num_frames * math.pi * 2) * 3
-        tail_tip = 44 + int(offset)
-        # Simple tail curve
-        draw.line([44, 45, tail_tip, 40], fill=DARK_ORANGE, width=3)
-        
-        frames.append(img)
-    
-    save_gif(frames, "pixel_cat.gif")
+        place_sprite(pixels, cat_tail, 0, 0, 44 + int(offset), tail)
+
+    with stage("convert"):
+        return image_from(pixels)
+
+@cached_render
+def generate_cat(frames=10, scale=None, output_dir=None, workers=1, palette=None):
+    images = imap_frames(partial(draw_cat, num_frames=frames, palette=palette), frames, workers)
+    save_gif(images, variant_filename("pixel_cat.gif", palette, CAT_PALETTES),
+             scales=scale and (scale,), output_dir=output_dir)
 
 # --- 2. Rabbit (White Bunny) ---
-def generate_rabbit():
-    frames = []
-    num_frames = 8
+def rabbit_body(draw, x, y, fur):
+    # Body (Round)
+    draw.ellipse([x+20, y+30, x+44, y+50], fill=fur)
+    # Head
+    draw.ellipse([x+22, y+15, x+42, y+35], fill=fur)
+
+def rabbit_ear(draw, x, y, fur, inner):
+    draw.ellipse([x, y, x+6, y+15], fill=fur)
+    draw.ellipse([x+2, y+3, x+4, y+13], fill=inner)
+
+def rabbit_eyes(draw, x, y):
+    draw.rectangle([x+26, y+22, x+28, y+24], fill=BLACK)
+    draw.rectangle([x+36, y+22, x+38, y+24], fill=BLACK)
+
+def rabbit_nose(draw, x, y, color):
+    draw.rectangle([x+31, y+28, x+33, y+29], fill=color)
+
+def draw_rabbit(f, num_frames=8, palette=None):
+    fur, pink = RABBIT_PALETTES[palette or next(iter(RABBIT_PALETTES))]
     
-    FUR = (250, 250, 250)
-    PINK = (255, 192, 203)
+    with stage("background"):
+        pixels = create_canvas()
+    
+    with stage("shapes"):
+        place_sprite(pixels, rabbit_body, 0, 0, fur)
     
-    for f in range(num_frames):
-        img = create_canvas()
-        draw = ImageDraw.Draw(img)
-        
-        # Body (Round)
-        draw.ellipse([20, 30, 44, 50], fill=FUR)
-        
-        # Head
-        draw.ellipse([22, 15, 42, 35], fill=FUR)
-        
         # Ears (Twitch)
         ear_offset = 0
         if f in [2, 3]: ear_offset = 2 # Twitch down
-        
-        # Left Ear
-        draw.ellipse([22, 5+ear_offset, 28, 20+ear_offset], fill=FUR)
-        draw.ellipse([24, 8+ear_offset, 26, 18+ear_offset], fill=PINK)
-        
-        # Right Ear
-        draw.ellipse([36, 5, 42, 20], fill=FUR)
-        draw.ellipse([38, 8, 40, 18], fill=PINK)
-        
-        # Eyes
-        draw.rectangle([26, 22, 28, 24], fill=BLACK)
-        draw.rectangle([36, 22, 38, 24], fill=BLACK)
-        
+        place_sprite(pixels, rabbit_ear, 22, 5+ear_offset, fur, pink) # Left
+        place_sprite(pixels, rabbit_ear, 36, 5, fur, pink) # Right
+    
+        place_sprite(pixels, rabbit_eyes, 0, 0)
+    
         # Nose (Wiggle)
-        nose_y = 28
-        if f % 2 == 0: nose_y -= 1
-        draw.rectangle([31, nose_y, 33, nose_y+1], fill=PINK)
-        
-        frames.append(img)
-        
-    save_gif(frames, "pixel_rabbit.gif")
+        nose_offset = -1 if f % 2 == 0 else 0
+        place_sprite(pixels, rabbit_nose, 0, nose_offset, pink)
+
+    with stage("convert"):
+        return image_from(pixels)
+
+@cached_render
+def generate_rabbit(frames=8, scale=None, output_dir=None, workers=1, palette=None):
+    images = imap_frames(partial(draw_rabbit, num_frames=frames, palette=palette), frames, workers)
+    save_gif(images, variant_filename("pixel_rabbit.gif", palette, RABBIT_PALETTES),
+             scales=scale and (scale,), output_dir=output_dir)
 
 # --- 3. Dog (Beagle style) ---
-def generate_dog():
-    frames = []
-    num_frames = 8
+def dog_body(draw, x, y, patch, coat):
+    # Body
+    draw.rectangle([x+20, y+35, x+44, y+50], fill=coat)
+    draw.rectangle([x+20, y+35, x+30, y+50], fill=patch) # Spot
+    # Head
+    draw.rectangle([x+22, y+20, x+42, y+35], fill=patch)
+    draw.rectangle([x+28, y+20, x+36, y+35], fill=coat) # Stripe
+
+def dog_ears(draw, x, y, patch):
+    # Ears (Floppy)
+    draw.rectangle([x+18, y+22, x+22, y+32], fill=patch) # Left
+    draw.rectangle([x+42, y+22, x+46, y+32], fill=patch) # Right
+
+def dog_eyes(draw, x, y):
+    draw.rectangle([x+26, y+25, x+28, y+27], fill=BLACK)
+    draw.rectangle([x+36, y+25, x+38, y+27], fill=BLACK)
+
+def dog_tongue(draw, x, y):
+    draw.rectangle([x+30, y+32, x+34, y+36], fill="red") # Out
+
+def dog_tail(draw, x, y, tip, coat):
+    draw.line([x+20, y+40, x+tip, y+30], fill=coat, width=2)
+
+def draw_dog(f, num_frames=8, palette=None):
+    patch, coat = DOG_PALETTES[palette or next(iter(DOG_PALETTES))]
     
-    BROWN = (139, 69, 19)
-    WHITE = (255, 255, 255)
+    with stage("background"):
+        pixels = create_canvas()
+    
+    with stage("shapes"):
+        place_sprite(pixels, dog_body, 0, 0, patch, coat)
     
-    for f in range(num_frames):
-        img = create_canvas()
-        draw = ImageDraw.Draw(img)
-        
-        # Body
-        draw.rectangle([20, 35, 44, 50], fill=WHITE)
-        draw.rectangle([20, 35, 30, 50], fill=BROWN) # Spot
-        
-        # Head
-        draw.rectangle([22, 20, 42, 35], fill=BROWN)
-        draw.rectangle([28, 20, 36, 35], fill=WHITE) # Stripe
-        
-        # Ears (Floppy)
         # Bounce effect
         bounce = 0
         if f % 2 == 0: bounce = 1
-        
-        draw.rectangle([18, 22+bounce, 22, 32+bounce], fill=BROWN) # Left
-        draw.rectangle([42, 22+bounce, 46, 32+bounce], fill=BROWN) # Right
-        
-        # Eyes
-        draw.rectangle([26, 25, 28, 27], fill=BLACK)
-        draw.rectangle([36, 25, 38, 27], fill=BLACK)
-        
+        place_sprite(pixels, dog_ears, 0, bounce, patch)
+    
+        place_sprite(pixels, dog_eyes, 0, 0)
+    
         # Tongue (Pant)
         if f % 2 == 0:
-            draw.rectangle([30, 32, 34, 36], fill="red") # Out
-        
+            place_sprite(pixels, dog_tongue, 0, 0)
+    
         # Tail (Fast Wag)
         tail_x = 20
         if f % 2 == 0: tail_x -= 2
-        draw.line([20, 40, tail_x, 30], fill=WHITE, width=2)
-        
-        frames.append(img)
-        
-    save_gif(frames, "pixel_dog.gif")
+        place_sprite(pixels, dog_tail, 0, 0, tail_x, coat)
+
+    with stage("convert"):
+        return image_from(pixels)
+
+@cached_render
+def generate_dog(frames=8, scale=None, output_dir=None, workers=1, palette=None):
+    images = imap_frames(partial(draw_dog, num_frames=frames, palette=palette), frames, workers)
+    save_gif(images, variant_filename("pixel_dog.gif", palette, DOG_PALETTES),
+             scales=scale and (scale,), output_dir=output_dir)
 
 if __name__ == "__main__":
     generate_cat()
@@ -1,8 +1,14 @@
-import numpy as np
-from PIL import Image, ImageDraw
 import random
 import math
 import os
+from functools import lru_cache, partial
+
+from frame_pool import buffer, image_from
+from gif_writer import write_gif_scales
+from instrument import stage
+from layers import blank_canvas, composite, place_sprite, static_layer
+from render_cache import cached_render
+from render_farm import imap_frames
 
 # Config - Higher Resolution for Finer Details
 CANVAS_WIDTH = 160
@@ -10,28 +16,26 @@ CANVAS_HEIGHT = 120
 SCALE = 4  # Lower scale multiplier since base res is higher
 OUTPUT_DIR = "animal_pixels_refined"
 
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
-
 # Palette
 BG_COLOR = (220, 235, 255) # Soft Sky Blue
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 
 # --- Utilities ---
-def create_canvas():
-    return Image.new('RGB', (CANVAS_WIDTH, CANVAS_HEIGHT), BG_COLOR)
-
-def save_gif(frames, filename, duration=120):
-    # Scale up using Nearest Neighbor
-    scaled_frames = [f.resize((CANVAS_WIDTH * SCALE, CANVAS_HEIGHT * SCALE), Image.NEAREST) for f in frames]
-    scaled_frames[0].save(
-        f"{OUTPUT_DIR}/{filename}",
-        save_all=True,
-        append_images=scaled_frames[1:],
-        duration=duration,
-        loop=0
-    )
+def save_gif(frames, filename, duration=120, scales=None, output_dir=None):
+    # Scale up using Nearest Neighbor, done inside the encoder so frames
+    # stay at native resolution. The first scale gets `filename`; extra scales are
+    # written from the same render as <name>_<scale>x.gif. Frames are streamed,
+    # so any iterable works.
+    # One shared palette plus changed-region-only frames: loops barely change
+    # between frames (blinks, wags), so most frames shrink to a few pixels.
+    output_dir = output_dir or OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    scales = scales or (SCALE,)
+    stem, ext = os.path.splitext(filename)
+    paths = {s: os.path.join(output_dir, filename if s == scales[0] else f"{stem}_{s}x{ext}")
+             for s in scales}
+    write_gif_scales(paths, frames, duration=duration, optimize=True, colors=(BG_COLOR, WHITE, BLACK))
     print(f"Generated {filename}")
 
 def draw_grass(draw):
@@ -43,169 +47,231 @@ def draw_grass(draw):
         h = rng.randint(2, 6)
         draw.line([x, CANVAS_HEIGHT-20, x, CANVAS_HEIGHT-20-h], fill=(80, 160, 80))
 
+@lru_cache(maxsize=None)
+def grass_background():
+    # Ground and grass never change, so they are rasterized once and blitted
+    pixels = blank_canvas((CANVAS_WIDTH, CANVAS_HEIGHT), BG_COLOR)
+    composite(pixels, static_layer(draw_grass, (CANVAS_WIDTH, CANVAS_HEIGHT)))
+    pixels.setflags(write=False)
+    return pixels
+
+def create_grass_canvas():
+    background = grass_background()
+    return buffer(background.shape, fill=background)
+
+def variant_filename(filename, palette, palettes):
+    # The default palette keeps the plain filename; others get a _<palette> suffix
+    if palette is not None and palette not in palettes:
+        raise ValueError(f"Unknown palette '{palette}', choose from: {', '.join(palettes)}")
+    if palette is None or palette == next(iter(palettes)):
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{palette}{ext}"
+
+# Every body part below is a sprite: drawn around (x, y), rasterized once per
+# variant (colors, pose) and blitted into each frame with place_sprite.
+# Parts that only move (head bob, tilt) are blitted at an offset, never redrawn.
+
 # --- 1. Refined Cat (Detailed Tabby) ---
-def generate_cat_refined():
-    frames = []
-    num_frames = 12
-    
-    ORANGE = (230, 140, 50)
-    STRIPE = (180, 100, 30)
-    WHITE = (255, 255, 255)
-    EYE_GREEN = (100, 200, 100)
+CAT_PALETTES = {
+    "tabby": ((230, 140, 50), (180, 100, 30), (255, 255, 255), (100, 200, 100)),  # Fur, Stripe, Chest, Eyes
+    "silver": ((170, 170, 180), (110, 110, 120), (240, 240, 245), (120, 180, 230)),
+    "tuxedo": ((45, 45, 55), (25, 25, 30), (255, 255, 255), (220, 200, 60)),
+}
+
+def cat_tail(draw, x, y, offset, fur):
+    # Tail base
+    draw.line([x+10, y-5, x+25, y-10+offset], fill=fur, width=4)
+
+def cat_body(draw, x, y, body_h, fur, chest):
+    # Body (Sitting)
+    draw.ellipse([x-15, y-body_h, x+15, y], fill=fur)
+    # Chest patch
+    draw.ellipse([x-8, y-body_h+5, x+8, y-10], fill=chest)
+
+def cat_head(draw, x, y, fur, stripe):
+    draw.ellipse([x-12, y, x+12, y+22], fill=fur)
+    # Stripes (Head)
+    draw.line([x-5, y+2, x+5, y+2], fill=stripe, width=1)
+    draw.line([x-4, y+4, x+4, y+4], fill=stripe, width=1)
+    # Ears
+    draw.polygon([(x-10, y+5), (x-14, y-5), (x-4, y+5)], fill=fur)
+    draw.polygon([(x+10, y+5), (x+14, y-5), (x+4, y+5)], fill=fur)
+
+def cat_eyes(draw, x, y, closed, iris):
+    if closed: # Blink
+        draw.line([x-8, y+12, x-4, y+12], fill=(50,30,0), width=1)
+        draw.line([x+4, y+12, x+8, y+12], fill=(50,30,0), width=1)
+    else:
+        draw.rectangle([x-8, y+10, x-4, y+13], fill=iris)
+        draw.rectangle([x+4, y+10, x+8, y+13], fill=iris)
+        # Pupils
+        draw.point((x-6, y+11), fill=(0,0,0))
+        draw.point((x+6, y+11), fill=(0,0,0))
+
+def cat_face(draw, x, y):
+    # Nose/Mouth
+    draw.point((x, y+16), fill="pink")
+    draw.line([x, y+16, x-2, y+18], fill=(50,30,0), width=1)
+    draw.line([x, y+16, x+2, y+18], fill=(50,30,0), width=1)
+    # Whiskers (Fine lines)
+    draw.line([x-15, y+16, x-8, y+17], fill=(200,200,200), width=1)
+    draw.line([x+15, y+16, x+8, y+17], fill=(200,200,200), width=1)
+
+def draw_cat_refined(f, num_frames=12, palette=None):
+    fur, stripe, chest, iris = CAT_PALETTES[palette or next(iter(CAT_PALETTES))]
     
     cx, cy = CANVAS_WIDTH//2, CANVAS_HEIGHT - 30
     
-    for f in range(num_frames):
-        img = create_canvas()
-        draw = ImageDraw.Draw(img)
-        draw_grass(draw)
-        
+    with stage("background"):
+        pixels = create_grass_canvas()
+    
+    with stage("shapes"):
         # Breathing
         breath = math.sin(f / num_frames * math.pi * 2)
         body_h = 35 + breath * 1
-        
+    
         # Tail (Sine wave)
         tail_offset = math.sin(f / num_frames * math.pi * 2) * 5
-        # Tail base
-        draw.line([cx+10, cy-5, cx+25, cy-10+tail_offset], fill=ORANGE, width=4)
-        
-        # Body (Sitting)
-        draw.ellipse([cx-15, cy-body_h, cx+15, cy], fill=ORANGE)
-        # Chest patch
-        draw.ellipse([cx-8, cy-body_h+5, cx+8, cy-10], fill=WHITE)
-        
-        # Head
+        place_sprite(pixels, cat_tail, cx, cy, tail_offset, fur)
+        place_sprite(pixels, cat_body, cx, cy, body_h, fur, chest)
+    
+        # Head rides on the breathing body
         head_y = cy - body_h - 15
-        draw.ellipse([cx-12, head_y, cx+12, head_y+22], fill=ORANGE)
-        
-        # Stripes (Head)
-        draw.line([cx-5, head_y+2, cx+5, head_y+2], fill=STRIPE, width=1)
-        draw.line([cx-4, head_y+4, cx+4, head_y+4], fill=STRIPE, width=1)
-        
-        # Ears
-        draw.polygon([(cx-10, head_y+5), (cx-14, head_y-5), (cx-4, head_y+5)], fill=ORANGE)
-        draw.polygon([(cx+10, head_y+5), (cx+14, head_y-5), (cx+4, head_y+5)], fill=ORANGE)
-        
-        # Face details
-        # Eyes
-        if f in [5, 6]: # Blink
-            draw.line([cx-8, head_y+12, cx-4, head_y+12], fill=(50,30,0), width=1)
-            draw.line([cx+4, head_y+12, cx+8, head_y+12], fill=(50,30,0), width=1)
-        else:
-            draw.rectangle([cx-8, head_y+10, cx-4, head_y+13], fill=EYE_GREEN)
-            draw.rectangle([cx+4, head_y+10, cx+8, head_y+13], fill=EYE_GREEN)
-            # Pupils
-            draw.point((cx-6, head_y+11), fill=(0,0,0))
-            draw.point((cx+6, head_y+11), fill=(0,0,0))
-            
-        # Nose/Mouth
-        draw.point((cx, head_y+16), fill="pink")
-        draw.line([cx, head_y+16, cx-2, head_y+18], fill=(50,30,0), width=1)
-        draw.line([cx, head_y+16, cx+2, head_y+18], fill=(50,30,0), width=1)
-        
-        # Whiskers (Fine lines)
-        draw.line([cx-15, head_y+16, cx-8, head_y+17], fill=(200,200,200), width=1)
-        draw.line([cx+15, head_y+16, cx+8, head_y+17], fill=(200,200,200), width=1)
+        place_sprite(pixels, cat_head, cx, head_y, fur, stripe)
+        # Eyes (Blink)
+        place_sprite(pixels, cat_eyes, cx, head_y, f in [5, 6], iris)
+        place_sprite(pixels, cat_face, cx, head_y)
 
-        frames.append(img)
-    
-    save_gif(frames, "fine_cat.gif")
+    with stage("convert"):
+        return image_from(pixels)
+
+@cached_render
+def generate_cat_refined(frames=12, scale=None, output_dir=None, workers=1, palette=None):
+    images = imap_frames(partial(draw_cat_refined, num_frames=frames, palette=palette), frames, workers)
+    save_gif(images, variant_filename("fine_cat.gif", palette, CAT_PALETTES),
+             scales=scale and (scale,), output_dir=output_dir)
 
 # --- 2. Refined Rabbit (Fluffy) ---
-def generate_rabbit_refined():
-    frames = []
-    num_frames = 8 # Faster movement
-    
-    GREY_FUR = (200, 200, 210)
-    DARK_GREY = (150, 150, 160)
-    PINK = (255, 180, 190)
+RABBIT_PALETTES = {
+    "grey": ((200, 200, 210), (255, 180, 190)),  # Fur, Inner ear / Nose
+    "brown": ((160, 115, 80), (235, 170, 160)),
+    "snow": ((245, 245, 250), (255, 170, 185)),
+}
+
+def rabbit_body(draw, x, y, fur):
+    # Body
+    draw.ellipse([x-12, y-20, x+12, y], fill=fur)
+    # Tail
+    draw.ellipse([x+10, y-10, x+18, y-2], fill=WHITE)
+
+def rabbit_head(draw, x, y, fur, pink):
+    draw.ellipse([x-10, y, x+8, y+16], fill=fur)
+    # Ears (Long)
+    draw.ellipse([x-8, y-15, x-4, y+5], fill=fur) # Left Back
+    draw.ellipse([x-2, y-15, x+2, y+5], fill=fur) # Right Front
+    draw.ellipse([x-1, y-12, x+1, y], fill=pink) # Inner
+    # Face
+    draw.rectangle([x-6, y+8, x-4, y+10], fill=(0,0,0)) # Eye
+
+def rabbit_snack(draw, x, y, pink):
+    # Nose/Chewing
+    draw.point((x+2, y+10), fill=pink)
+    # Carrot
+    draw.polygon([(x+5, y+12), (x+15, y+10), (x+6, y+14)], fill="orange")
+    draw.line([x+15, y+10, x+18, y+8], fill="green", width=1)
+
+def draw_rabbit_refined(f, num_frames=8, palette=None):
+    fur, pink = RABBIT_PALETTES[palette or next(iter(RABBIT_PALETTES))]
     
     cx, cy = CANVAS_WIDTH//2, CANVAS_HEIGHT - 30
     
-    for f in range(num_frames):
-        img = create_canvas()
-        draw = ImageDraw.Draw(img)
-        draw_grass(draw)
-        
+    with stage("background"):
+        pixels = create_grass_canvas()
+    
+    with stage("shapes"):
         # Eating animation (Head bob)
         bob = 0
         if f % 2 == 0: bob = 1
-        
-        # Body
-        draw.ellipse([cx-12, cy-20, cx+12, cy], fill=GREY_FUR)
-        # Tail
-        draw.ellipse([cx+10, cy-10, cx+18, cy-2], fill=WHITE)
-        
+    
+        place_sprite(pixels, rabbit_body, cx, cy, fur)
+    
         # Head
         h_y = cy - 25 + bob
-        draw.ellipse([cx-10, h_y, cx+8, h_y+16], fill=GREY_FUR)
-        
-        # Ears (Long)
-        draw.ellipse([cx-8, h_y-15, cx-4, h_y+5], fill=GREY_FUR) # Left Back
-        draw.ellipse([cx-2, h_y-15, cx+2, h_y+5], fill=GREY_FUR) # Right Front
-        draw.ellipse([cx-1, h_y-12, cx+1, h_y], fill=PINK) # Inner
-        
-        # Face
-        draw.rectangle([cx-6, h_y+8, cx-4, h_y+10], fill=(0,0,0)) # Eye
-        
-        # Nose/Chewing
-        draw.point((cx+2, h_y+10+bob), fill=PINK)
-        
-        # Carrot
-        draw.polygon([(cx+5, h_y+12+bob), (cx+15, h_y+10+bob), (cx+6, h_y+14+bob)], fill="orange")
-        draw.line([cx+15, h_y+10+bob, cx+18, h_y+8+bob], fill="green", width=1)
+        place_sprite(pixels, rabbit_head, cx, h_y, fur, pink)
+        # Chewing moves the nose and carrot another step
+        place_sprite(pixels, rabbit_snack, cx, h_y+bob, pink)
 
-        frames.append(img)
-    
-    save_gif(frames, "fine_rabbit.gif")
+    with stage("convert"):
+        return image_from(pixels)
+
+@cached_render
+def generate_rabbit_refined(frames=8, scale=None, output_dir=None, workers=1, palette=None):
+    images = imap_frames(partial(draw_rabbit_refined, num_frames=frames, palette=palette), frames, workers)
+    save_gif(images, variant_filename("fine_rabbit.gif", palette, RABBIT_PALETTES),
+             scales=scale and (scale,), output_dir=output_dir)
 
 # --- 3. Refined Dog (Shiba Inu) ---
-def generate_dog_refined():
-    frames = []
-    num_frames = 16
-    
-    TAN = (210, 160, 100)
-    CREAM = (245, 235, 220)
+DOG_PALETTES = {
+    "shiba": ((210, 160, 100), (245, 235, 220)),  # Coat, Cream
+    "black_tan": ((50, 40, 40), (225, 190, 140)),
+    "sesame": ((170, 120, 80), (240, 225, 205)),
+}
+
+def dog_body(draw, x, y, coat, cream):
+    draw.ellipse([x-15, y-25, x+15, y], fill=coat)
+    draw.ellipse([x-8, y-25, x+8, y-10], fill=cream) # Belly
+
+def dog_head(draw, x, y, coat, cream):
+    draw.ellipse([x-14, y, x+14, y+24], fill=coat)
+    # Snout mask
+    draw.ellipse([x-8, y+12, x+8, y+24], fill=cream)
+    # Ears (Triangular)
+    draw.polygon([(x-10, y+5), (x-14, y-4), (x-6, y+5)], fill=coat)
+    draw.polygon([(x+10, y+5), (x+14, y-4), (x+6, y+5)], fill=coat)
+    # Face
+    draw.rectangle([x-6, y+10, x-3, y+13], fill=(0,0,0)) # L Eye
+    draw.rectangle([x+3, y+10, x+6, y+13], fill=(0,0,0)) # R Eye
+    draw.rectangle([x-2, y+16, x+2, y+19], fill=(0,0,0)) # Nose
+
+def dog_tongue(draw, x, y):
+    draw.ellipse([x-2, y+20, x+2, y+26], fill="pink")
+
+def dog_tail(draw, x, y, coat):
+    # Tail (Curly)
+    draw.arc([x+10, y-20, x+25, y-5], start=180, end=360, fill=coat, width=4)
+
+def draw_dog_refined(f, num_frames=16, palette=None):
+    coat, cream = DOG_PALETTES[palette or next(iter(DOG_PALETTES))]
     
     cx, cy = CANVAS_WIDTH//2, CANVAS_HEIGHT - 30
     
-    for f in range(num_frames):
-        img = create_canvas()
-        draw = ImageDraw.Draw(img)
-        draw_grass(draw)
-        
-        # Body
-        draw.ellipse([cx-15, cy-25, cx+15, cy], fill=TAN)
-        draw.ellipse([cx-8, cy-25, cx+8, cy-10], fill=CREAM) # Belly
-        
+    with stage("background"):
+        pixels = create_grass_canvas()
+    
+    with stage("shapes"):
+        place_sprite(pixels, dog_body, cx, cy, coat, cream)
+    
         # Head
         h_y = cy - 35
         # Tilt head
         tilt = math.sin(f / num_frames * math.pi * 2) * 2
-        
-        draw.ellipse([cx-14+tilt, h_y, cx+14+tilt, h_y+24], fill=TAN)
-        # Snout mask
-        draw.ellipse([cx-8+tilt, h_y+12, cx+8+tilt, h_y+24], fill=CREAM)
-        
-        # Ears (Triangular)
-        draw.polygon([(cx-10+tilt, h_y+5), (cx-14+tilt, h_y-4), (cx-6+tilt, h_y+5)], fill=TAN)
-        draw.polygon([(cx+10+tilt, h_y+5), (cx+14+tilt, h_y-4), (cx+6+tilt, h_y+5)], fill=TAN)
-        
-        # Face
-        draw.rectangle([cx-6+tilt, h_y+10, cx-3+tilt, h_y+13], fill=(0,0,0)) # L Eye
-        draw.rectangle([cx+3+tilt, h_y+10, cx+6+tilt, h_y+13], fill=(0,0,0)) # R Eye
-        draw.rectangle([cx-2+tilt, h_y+16, cx+2+tilt, h_y+19], fill=(0,0,0)) # Nose
-        
+        place_sprite(pixels, dog_head, cx+tilt, h_y, coat, cream)
+    
         # Tongue (Pant)
         if f % 4 < 2:
-            draw.ellipse([cx-2+tilt, h_y+20, cx+2+tilt, h_y+26], fill="pink")
-            
-        # Tail (Curly)
-        draw.arc([cx+10, cy-20, cx+25, cy-5], start=180, end=360, fill=TAN, width=4)
+            place_sprite(pixels, dog_tongue, cx+tilt, h_y)
+        
+        place_sprite(pixels, dog_tail, cx, cy, coat)
 
-        frames.append(img)
-    
-    save_gif(frames, "fine_dog.gif")
+    with stage("convert"):
+        return image_from(pixels)
+
+@cached_render
+def generate_dog_refined(frames=16, scale=None, output_dir=None, workers=1, palette=None):
+    images = imap_frames(partial(draw_dog_refined, num_frames=frames, palette=palette), frames, workers)
+    save_gif(images, variant_filename("fine_dog.gif", palette, DOG_PALETTES),
+             scales=scale and (scale,), output_dir=output_dir)
 
 if __name__ == "__main__":
     generate_cat_refined()
@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Config
+MEDIA_ROOT = "media_batch"
+QUALITY = "low_quality"
+REPORT_FILE = "batch_report.json"
+
+# --- Scene Registry ---
+# name -> (module, class). Scenes take title / palette / radius / timings keyword
+# arguments on top of the defaults in their class.
+SCENES = {
+    "StudyAnimation": ("scene", "StudyAnimation"),
+    "CartoonSlime": ("cartoon_scene", "CartoonSlime"),
+}
+# manim's -q flags -> config quality presets
+QUALITIES = {
+    "l": "low_quality", "m": "medium_quality", "h": "high_quality",
+    "p": "production_quality", "k": "fourk_quality",
+}
+
+def resolve_colors(value):
+    """Turns manim color names ("BLUE") in a JSON value into manim colors; hex strings pass through."""
+    import manim
+    if isinstance(value, str) and value.isupper() and hasattr(manim, value):
+        return getattr(manim, value)
+    if isinstance(value, list):
+        return [resolve_colors(v) for v in value]
+    if isinstance(value, dict):
+        return {k: resolve_colors(v) for k, v in value.items()}
+    return value
+
+def render_variant(variant, media_root=MEDIA_ROOT, quality=QUALITY, profile=False):
+    """
+    Renders one variant in this process. Each variant gets its own media
+    directory and quality preset, so parallel workers never share output or
+    partial-movie files. With profile, the per-call profile (see
+    scene_profile.py) goes to <media dir>/profile.csv.
+    """
+    import importlib
+    from manim import tempconfig
+
+    name = variant["name"]
+    module, cls = SCENES[variant["scene"]]
+    scene_class = getattr(importlib.import_module(module), cls)
+    params = {k: resolve_colors(v) if k == "palette" else v for k, v in variant.get("params", {}).items()}
+    preset = variant.get("quality", quality)
+    quality = QUALITIES.get(preset, preset)
+    media_dir = os.path.join(media_root, name)
+
+    options = {
+        "media_dir": media_dir,
+        "quality": quality,
+        "output_file": name,
+        "disable_caching": True,
+        "progress_bar": "none",
+        "verbosity": "WARNING",
+    }
+    start = time.perf_counter()
+    with tempconfig(options):
+        scene = scene_class(**params)
+        if profile:
+            scene.profile_path = os.path.join(media_dir, "profile.csv")
+        scene.render()
+        movie = str(scene.renderer.file_writer.movie_file_path)
+    return {
+        "name": name,
+        "scene": variant["scene"],
+        "quality": quality,
+        "seconds": round(time.perf_counter() - start, 3),
+        "output": movie,
+        **({"profile": scene.profile_path} if profile else {}),
+    }
+
+def run_batch(variants, workers=None, media_root=MEDIA_ROOT, quality=QUALITY, profile=False):
+    """Renders variants across worker processes; returns results in input order."""
+    names = [v["name"] for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("Variant names must be unique (they name the media directories)")
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_variant, v, media_root, quality, profile): v["name"] for v in variants}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:  # One broken variant should not sink the batch
+                results[name] = {"name": name, "error": f"{type(e).__name__}: {e}"}
+            r = results[name]
+            print(f"[{name}] " + (f"ERROR {r['error']}" if "error" in r else f"{r['seconds']:.2f}s -> {r['output']}"))
+    return [results[n] for n in names]
+
+def print_report(results):
+    print(f"{'variant':<24} {'scene':<16} {'quality':<18} {'seconds':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['name']:<24} ERROR {r['error']}")
+        else:
+            print(f"{r['name']:<24} {r['scene']:<16} {r['quality']:<18} {r['seconds']:>8.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render many parameterized variants of the Manim scenes in parallel.")
+    parser.add_argument("variants", help="JSON file: a list of {name, scene, params, quality?} objects")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--media-root", default=MEDIA_ROOT, help="Each variant renders into <media-root>/<name>")
+    parser.add_argument("--quality", default=QUALITY, help="Default preset: l/m/h/p/k or a manim quality name")
+    parser.add_argument("--profile", action="store_true", help="Also write a per-play/wait profile.csv for each variant")
+    parser.add_argument("--report", default=REPORT_FILE, help="Where to write per-variant timings as JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.variants) as f:
+        variants = json.load(f)
+    start = time.perf_counter()
+    results = run_batch(variants, args.workers, args.media_root, args.quality, args.profile)
+    print_report(results)
+    print(f"{len(results)} variants in {time.perf_counter() - start:.2f}s")
+    with open(args.report, "w") as f:
+        json.dump(results, f, indent=2)
+    return 1 if any("error" in r for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
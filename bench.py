@@ -0,0 +1,333 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Config
+BASELINE_FILE = "bench_baseline.json"
+RESULTS_FILE = "bench_results.json"
+TOLERANCE = 0.25  # Allowed slowdown / growth over the baseline before a case fails
+METRICS = ("wall_s", "peak_rss_kb", "tracemalloc_peak_kb", "output_bytes")
+MAX_ERROR = 8  # Largest channel difference allowed between a decoded GIF and its frames where the palette is clipped
+
+# --- Benchmark Cases ---
+# name -> (generator, overrides, frames). Each generator runs at a few sizes so
+# scaling problems (frames, resolution, particle count) show up separately.
+CASES = {
+    "lofi_pixel_art/30f": ("lofi_pixel_art", {"frames": 30}, 30),
+    "lofi_pixel_art/640x360": ("lofi_pixel_art", {"frames": 30, "size": (640, 360)}, 30),
+    "lofi_pixel_art/120f": ("lofi_pixel_art", {"frames": 120}, 120),
+    "flow_field_art/4k_particles": ("flow_field_art", {"frames": 60}, 60),
+    "flow_field_art/100k_particles": ("flow_field_art", {"frames": 20, "particle_count": 100_000}, 20),
+    "flow_field_art/960x540": ("flow_field_art", {"frames": 20, "size": (960, 540), "particle_count": 16_000}, 20),
+    "flow_field_art/1920x1080_tiled": ("flow_field_art", {"frames": 20, "size": (1920, 1080), "particle_count": 64_000,
+                                                          "workers": 0}, 20),
+    "sky_island/30f": ("sky_island", {"frames": 30}, 30),
+    "sky_island/640x360": ("sky_island", {"frames": 30, "size": (640, 360)}, 30),
+    "crystal_cave/20f": ("crystal_cave", {"frames": 20}, 20),
+    "crystal_cave/80f": ("crystal_cave", {"frames": 80}, 80),
+    "cartoon_character/20f": ("cartoon_character", {"frames": 20}, 20),
+    "cartoon_character/800x800": ("cartoon_character", {"frames": 20, "size": (800, 800)}, 20),
+    "cat/10f": ("cat", {"frames": 10}, 10),
+    "rabbit/8f": ("rabbit", {"frames": 8}, 8),
+    "dog/8f": ("dog", {"frames": 8}, 8),
+    "cat_refined/12f": ("cat_refined", {"frames": 12}, 12),
+    "cat_refined/96f": ("cat_refined", {"frames": 96}, 96),
+    "rabbit_refined/8f": ("rabbit_refined", {"frames": 8}, 8),
+    "dog_refined/16f": ("dog_refined", {"frames": 16}, 16),
+}
+
+# Manim scenes: name -> (file, scene class, quality flag)
+MANIM_CASES = {
+    "manim/StudyAnimation/ql": ("scene.py", "StudyAnimation", "-ql"),
+    "manim/CartoonSlime/ql": ("cartoon_scene.py", "CartoonSlime", "-ql"),
+    "manim/CartoonSlime/qm": ("cartoon_scene.py", "CartoonSlime", "-qm"),
+}
+
+# --- Measurement ---
+def dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+def peak_rss_kb(usage):
+    # ru_maxrss is kilobytes on Linux but bytes on macOS
+    return usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+def run_case(name, trace_memory=True):
+    """Runs one Pillow case in this process (called in a fresh child per case)."""
+    import render
+
+    generator, overrides, frames = CASES[name]
+    render.load(generator)  # Keep module import time out of the measurement
+    with tempfile.TemporaryDirectory() as out:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        render.render(generator, output_dir=out, **overrides)
+        wall = time.perf_counter() - start
+        traced = tracemalloc.get_traced_memory()[1] // 1024 if trace_memory else None
+        tracemalloc.stop()
+        return {
+            "wall_s": round(wall, 4),
+            "frames": frames,
+            "fps": round(frames / wall, 2),
+            # Worker pools (workers > 1, tiled renders) run in child processes
+            "peak_rss_kb": max(peak_rss_kb(resource.getrusage(resource.RUSAGE_SELF)),
+                               peak_rss_kb(resource.getrusage(resource.RUSAGE_CHILDREN))),
+            "tracemalloc_peak_kb": traced,
+            "output_bytes": dir_bytes(out),
+        }
+
+def run_child(name, trace_memory):
+    # A fresh interpreter per case keeps peak RSS from leaking between cases
+    cmd = [sys.executable, os.path.abspath(__file__), "_case", name]
+    if not trace_memory:
+        cmd.append("--no-tracemalloc")
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def run_manim(name):
+    """Renders a Manim scene with the manim CLI and measures the child process."""
+    scene_file, scene, quality = MANIM_CASES[name]
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as media:
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-m", "manim", quality, "--media_dir", media, "--disable_caching",
+             os.path.join(here, scene_file), scene],
+            capture_output=True, text=True, cwd=here,
+        )
+        wall = time.perf_counter() - start
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        videos = [os.path.join(r, f) for r, _, fs in os.walk(media) for f in fs if f.endswith((".mp4", ".mov", ".gif"))]
+        return {
+            "wall_s": round(wall, 4),
+            "frames": None,
+            "fps": None,
+            # RUSAGE_CHILDREN only reports the largest child so far
+            "peak_rss_kb": max(peak_rss_kb(after), peak_rss_kb(before)),
+            "tracemalloc_peak_kb": None,
+            "output_bytes": sum(os.path.getsize(v) for v in videos),
+        }
+
+# --- GIF Fidelity ---
+# name -> (generator, overrides, max error). Every GIF the generator writes is
+# decoded and compared frame by frame with the frames handed to the GIF writer,
+# so palette or delta-frame bugs show up as color errors rather than only as
+# sizes. Scenes whose colors fit the GIF palette must come back exactly (0).
+FIDELITY_CASES = {
+    "lofi_pixel_art": ("lofi_pixel_art", {"frames": 30}, 0),
+    "flow_field_art": ("flow_field_art", {"frames": 60}, MAX_ERROR),
+    "sky_island": ("sky_island", {"frames": 30}, 0),
+    "crystal_cave": ("crystal_cave", {"frames": 20}, MAX_ERROR),
+    "cartoon_character": ("cartoon_character", {"frames": 20}, 0),
+    "cat": ("cat", {"frames": 10}, 0),
+    "rabbit": ("rabbit", {"frames": 8}, 0),
+    "dog": ("dog", {"frames": 8}, 0),
+    "cat_refined": ("cat_refined", {"frames": 12}, 0),
+    "rabbit_refined": ("rabbit_refined", {"frames": 8}, 0),
+    "dog_refined": ("dog_refined", {"frames": 16}, 0),
+}
+
+# name -> (module, frame function, generator, frames, frame duration ms, output scale, max error).
+# Scenes snapped onto a clip palette (gif_writer.clip_palette) before the GIF
+# writer sees them are also compared with what the frame function draws.
+REFERENCE_CASES = {
+    "crystal_cave/reference": ("fantasy_gen", "draw_crystal_cave", "crystal_cave", 20, 150, 2, MAX_ERROR),
+}
+
+def decoded_frames(path, duration=None, scale=1):
+    # Decoded GIF frames at native size; with a duration, one per `duration` of
+    # playback (merged duplicates expanded), else one per stored frame
+    from PIL import Image, ImageSequence
+    import numpy as np
+
+    frames = []
+    with Image.open(path) as gif:
+        for frame in ImageSequence.Iterator(gif):
+            pixels = np.asarray(frame.convert('RGB'))[::scale, ::scale]
+            frames += [pixels] * (1 if duration is None else max(1, round(frame.info.get("duration", duration) / duration)))
+    return frames
+
+def fed_frames(generator, overrides, out):
+    """Renders a generator into out and returns {GIF path: frames handed to the GIF writer}."""
+    import numpy as np
+    import gif_writer
+    import render
+
+    fed = {}
+    single, multi = gif_writer.GifWriter.write, gif_writer.MultiScaleGifWriter.write
+
+    def record(writers, frame):
+        pixels = np.asarray(frame.convert('RGB'))
+        for writer in writers:
+            fed.setdefault(writer.path, []).append(pixels)
+
+    def write(self, frame, *args, **kwargs):
+        record([self], frame)
+        return single(self, frame, *args, **kwargs)
+
+    def write_scales(self, frame, *args, **kwargs):
+        record(self.writers, frame)
+        return multi(self, frame, *args, **kwargs)
+
+    gif_writer.GifWriter.write, gif_writer.MultiScaleGifWriter.write = write, write_scales
+    try:
+        render.render(generator, output_dir=out, **overrides)
+    finally:
+        gif_writer.GifWriter.write, gif_writer.MultiScaleGifWriter.write = single, multi
+    return fed
+
+def frame_errors(decoded, expected, limit):
+    # Largest channel error over all frames and how many pixels exceed the limit
+    import numpy as np
+
+    max_error = off = 0
+    for pixels, reference in zip(decoded, expected):
+        diff = np.abs(np.asarray(reference, dtype=np.int16) - pixels).max(axis=2)
+        max_error = max(max_error, int(diff.max()))
+        off += int((diff > limit).sum())
+    return {"max_error": max_error, "pixels_off": off, "limit": limit}
+
+def check_fidelity(name):
+    """Renders a fidelity case and returns its largest channel error and how many pixels exceed its limit."""
+    generator, overrides, limit = FIDELITY_CASES[name]
+    worst = None
+    with tempfile.TemporaryDirectory() as out:
+        fed = fed_frames(generator, overrides, out)
+        if not fed:
+            return {"error": "no GIF written"}
+        for path, frames in fed.items():
+            scale = 1
+            decoded = decoded_frames(path)
+            if decoded:
+                scale = decoded[0].shape[1] // frames[0].shape[1]
+                decoded = [pixels[::scale, ::scale] for pixels in decoded]
+            if len(decoded) != len(frames):
+                return {"error": f"{os.path.basename(path)}: decoded {len(decoded)} frames, wrote {len(frames)}"}
+            r = frame_errors(decoded, frames, limit)
+            if worst is None or r["max_error"] > worst["max_error"]:
+                worst = r
+    return worst
+
+def check_reference(name):
+    """Renders a reference case and compares its decoded GIF with the frame function's frames."""
+    import importlib
+    import render
+
+    module, draw, generator, frames, duration, scale, limit = REFERENCE_CASES[name]
+    draw = getattr(importlib.import_module(module), draw)
+    with tempfile.TemporaryDirectory() as out:
+        render.render(generator, output_dir=out, frames=frames)
+        decoded = decoded_frames(os.path.join(out, generator + ".gif"), duration, scale)
+    if len(decoded) != frames:
+        return {"error": f"decoded {len(decoded)} frames, expected {frames}"}
+    return frame_errors(decoded, (draw(f, frames) for f in range(frames)), limit)
+
+# --- Baseline Comparison ---
+def compare(results, baseline, tolerance):
+    """Returns (case, metric, baseline, current) for every metric that got worse beyond the tolerance."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or "error" in current or "error" in base:
+            continue
+        for metric in METRICS:
+            old, new = base.get(metric), current.get(metric)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+def print_table(results):
+    print(f"{'case':<34} {'wall s':>8} {'fps':>8} {'rss MB':>8} {'py peak MB':>10} {'output KB':>10}")
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:<34} ERROR {r['error']}")
+            continue
+        fmt = lambda v, d: "-" if v is None else f"{v / d:.1f}"
+        print(f"{name:<34} {r['wall_s']:>8.3f} {r['fps'] if r['fps'] is not None else '-':>8} "
+              f"{fmt(r['peak_rss_kb'], 1024):>8} {fmt(r['tracemalloc_peak_kb'], 1024):>10} {fmt(r['output_bytes'], 1024):>10}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every generator and Manim scene against a stored baseline.")
+    parser.add_argument("cases", nargs="*", help="Only run cases whose name contains one of these strings")
+    parser.add_argument("--output", default=RESULTS_FILE, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed regression ratio (0.25 = 25%%)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip Python allocation tracing (less overhead)")
+    parser.add_argument("--no-manim", action="store_true", help="Skip the Manim scenes")
+    parser.add_argument("--no-fidelity", action="store_true", help="Skip decoding GIFs against their rendered frames")
+    args = parser.parse_args(argv)
+
+    wanted = lambda name: not args.cases or any(c in name for c in args.cases)
+    results = {}
+    for name in filter(wanted, CASES):
+        results[name] = run_child(name, not args.no_tracemalloc)
+    if not args.no_manim:
+        if importlib.util.find_spec("manim") is None:
+            print("manim is not installed, skipping the Manim scenes", file=sys.stderr)
+        else:
+            for name in filter(wanted, MANIM_CASES):
+                results[name] = run_manim(name)
+    fidelity = {}
+    if not args.no_fidelity:
+        fidelity = {name: check_fidelity(name) for name in filter(wanted, FIDELITY_CASES)}
+        fidelity.update({name: check_reference(name) for name in filter(wanted, REFERENCE_CASES)})
+
+    print_table(results)
+    for name, r in fidelity.items():
+        print(f"fidelity {name}: " + (f"ERROR {r['error']}" if "error" in r else
+                                      f"max error {r['max_error']} (limit {r['limit']}), "
+                                      f"{r['pixels_off']} pixels over the limit"))
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+        "fidelity": fidelity,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.update_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Updated baseline {args.baseline}")
+        return 0
+
+    failed = [n for n, r in results.items() if "error" in r]
+    failed += [f"fidelity/{n}" for n, r in fidelity.items() if "error" in r or r["max_error"] > r["limit"]]
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 1 if failed else 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for name, metric, old, new in regressions:
+        print(f"REGRESSION {name}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)", file=sys.stderr)
+    if failed:
+        print(f"FAILED cases: {', '.join(failed)}", file=sys.stderr)
+    return 1 if regressions or failed else 0
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "_case":
+        # Child mode: run one case and print its metrics as the last output line
+        print(json.dumps(run_case(sys.argv[2], "--no-tracemalloc" not in sys.argv)))
+        sys.exit(0)
+    sys.exit(main())
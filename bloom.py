@@ -0,0 +1,119 @@
+import math
+import numpy as np
+
+from frame_pool import borrowed
+
+# --- Bloom / Glow Post-Process ---
+# Bright pixels are thresholded, blurred and added back. The blur is a few
+# separable box passes (running sums, so any radius costs the same per pixel)
+# on a mip pyramid: the image is halved until the remaining radius is small,
+# blurred there and upsampled back. Large glows therefore get cheaper, not
+# more expensive, unlike stacked circles or a full-resolution Gaussian.
+THRESHOLD = 160     # Channel value where pixels start to bloom
+RADIUS = 6          # Glow spread in pixels (about one Gaussian sigma)
+STRENGTH = 0.8      # How much of the blurred light is added back
+PASSES = 3          # Box passes per axis; three are visually Gaussian
+LEVEL_RADIUS = 3    # Largest radius blurred at one pyramid level before halving
+
+def box_blur(a, radius, axis):
+    """Mean over a (2 * radius + 1) window along one axis of a float array (zeros past the edges)."""
+    if radius < 1:
+        return a
+    pad = [(0, 0)] * a.ndim
+    pad[axis] = (radius + 1, radius)
+    c = np.cumsum(np.pad(a, pad), axis=axis, dtype=np.float32)
+    hi = [slice(None)] * a.ndim
+    lo = [slice(None)] * a.ndim
+    hi[axis] = slice(2 * radius + 1, None)
+    lo[axis] = slice(None, -(2 * radius + 1))
+    out = c[tuple(hi)] - c[tuple(lo)]
+    out *= 1 / (2 * radius + 1)
+    return out
+
+def _downsample(a):
+    # 2x2 mean; an odd last row/column is averaged with itself
+    h, w = a.shape[:2]
+    if h % 2 or w % 2:
+        a = np.pad(a, [(0, h % 2), (0, w % 2)] + [(0, 0)] * (a.ndim - 2), mode='edge')
+    out = a[0::2, 0::2] + a[1::2, 0::2]
+    out += a[0::2, 1::2]
+    out += a[1::2, 1::2]
+    out *= 0.25
+    return out
+
+def _upsample_axis(a, axis, size):
+    # Linear 2x along axis 0 or 1: each source sample makes two, weighted 3/4 to
+    # itself and 1/4 toward the neighbour on that side (edges clamp). The pairs
+    # are written to a new axis right after `axis` and then merged into it.
+    n = a.shape[axis]
+    shape = a.shape[:axis + 1] + (2,) + a.shape[axis + 1:]
+    out = np.empty(shape, dtype=a.dtype)
+    src = np.moveaxis(a, axis, 0)
+    even, odd = (np.moveaxis(half, axis, 0) for half in np.moveaxis(out, axis + 1, 0))
+    np.multiply(src, 0.75, out=even)
+    np.multiply(src, 0.75, out=odd)
+    even[1:] += 0.25 * src[:-1]
+    even[0] += 0.25 * src[0]
+    odd[:-1] += 0.25 * src[1:]
+    odd[-1] += 0.25 * src[-1]
+    out = out.reshape(a.shape[:axis] + (2 * n,) + a.shape[axis + 1:])
+    return out[:size] if axis == 0 else out[:, :size]
+
+def _upsample(a, shape):
+    # Columns first, while there are still half as many rows
+    return _upsample_axis(_upsample_axis(a, 1, shape[1]), 0, shape[0])
+
+def blur(a, radius, passes=PASSES):
+    """Approximate Gaussian blur (sigma ~ radius) of an (H, W[, C]) array, as float32."""
+    a = np.asarray(a, dtype=np.float32)
+    shapes = []
+    while radius > LEVEL_RADIUS and min(a.shape[:2]) >= 4:
+        shapes.append(a.shape)
+        a = _downsample(a)
+        radius /= 2
+    r = max(1, round(radius))
+    for _ in range(passes):
+        a = box_blur(box_blur(a, r, 0), r, 1)
+    for shape in reversed(shapes):
+        a = _upsample(a, shape)
+    return a
+
+def bright_pass(pixels, threshold=THRESHOLD):
+    """The light above threshold, per channel, rescaled to 0-255 (float32)."""
+    light = np.subtract(pixels, threshold, dtype=np.float32)
+    np.maximum(light, 0, out=light)
+    light *= 255 / max(255 - threshold, 1)
+    return light
+
+def add_light(pixels, light, strength=STRENGTH):
+    """pixels += light * strength in place on a uint8 array, saturating at 255."""
+    with borrowed(pixels.shape, np.float32) as total:
+        np.multiply(light, strength, out=total)
+        total += pixels
+        np.clip(total, 0, 255, out=total)
+        np.copyto(pixels, total, casting='unsafe')
+    return pixels
+
+def bloom(pixels, threshold=THRESHOLD, radius=RADIUS, strength=STRENGTH):
+    """Thresholds, blurs and adds back the bright parts of an (H, W, C) uint8 array in place."""
+    return add_light(pixels, blur(bright_pass(pixels, threshold), radius), strength)
+
+def add_glow(pixels, light, x, y, radius, strength=STRENGTH):
+    """
+    Blurs an (h, w, C) light patch whose top-left sits at integer (x, y) and adds
+    it onto pixels in place. Only a window of about four radii around the patch
+    is blurred, so small emitters on big frames stay cheap.
+    """
+    m = math.ceil(4 * radius)
+    h, w, channels = light.shape
+    padded = np.zeros((h + 2 * m, w + 2 * m, channels), dtype=np.float32)
+    padded[m:m + h, m:m + w] = light
+    top, left = y - m, x - m
+    sy0, sx0 = max(0, -top), max(0, -left)
+    sy1 = min(padded.shape[0], pixels.shape[0] - top)
+    sx1 = min(padded.shape[1], pixels.shape[1] - left)
+    if sy0 >= sy1 or sx0 >= sx1:
+        return pixels
+    glow = blur(padded, radius)[sy0:sy1, sx0:sx1]
+    add_light(pixels[top + sy0:top + sy1, left + sx0:left + sx1], glow, strength)
+    return pixels
@@ -1,27 +1,29 @@
-import numpy as np
-from PIL import Image, ImageDraw, ImageFilter, ImageOps
 import random
 import math
 import os
+from functools import lru_cache, partial
+
+from gif_writer import write_gif
+from instrument import stage
+from render_cache import cached_render
+from render_farm import imap_frames
+from scene_graph import Backdrop, Node, SceneGraph, pixel_box
 
 # Config
 WIDTH, HEIGHT = 400, 400
 OUTPUT_DIR = "cartoon_style"
 
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
-
 # --- Cartoon Drawing Utilities ---
 
 def draw_blob(draw, x, y, size, color, seed=None):
     """Draws an organic 'blob' shape commonly found in modern flat cartoons."""
-    if seed: random.seed(seed)
+    rng = random.Random(seed) # Private stream, leaves the global random state alone
     points = []
     num_points = 8
     for i in range(num_points):
         angle = (i / num_points) * 2 * math.pi
         # Vary radius for organic feel
-        r = size * (0.8 + random.random() * 0.4)
+        r = size * (0.8 + rng.random() * 0.4)
         px = x + math.cos(angle) * r
         py = y + math.sin(angle) * r
         points.append((px, py))
@@ -55,63 +57,90 @@ def draw_eye(draw, x, y, size, look_at=(0,0)):
     draw.ellipse([px+pupil_size*0.2, py-pupil_size*0.5, px+pupil_size*0.2+shine_size, py-pupil_size*0.5+shine_size], fill="white")
 
 # --- Scene: The "Blobby" Character ---
-def generate_cartoon_character(frames=20):
-    images = []
-    
-    # Palette (Pastel/Flat)
-    BG_COLOR = "#FFD1DC" # Pinkish
-    BODY_COLOR = "#87CEEB" # Sky Blue
-    SHADOW_COLOR = "#5F9EA0" # Darker Blue
-    
-    # Interaction Target (A flying fly)
-    fly_x, fly_y = WIDTH//2, HEIGHT//2
-    
-    for f in range(frames):
-        img = Image.new('RGB', (WIDTH, HEIGHT), BG_COLOR)
-        draw = ImageDraw.Draw(img)
-        
-        t = f / frames * 2 * math.pi
-        
-        # 1. Fly Movement (Figure 8)
-        fly_x = WIDTH//2 + math.cos(t) * 100
-        fly_y = HEIGHT//2 - 100 + math.sin(t*2) * 50
-        
-        # Draw Fly trail
-        draw.line([fly_x-5, fly_y, fly_x+5, fly_y], fill="black", width=1)
-        draw.ellipse([fly_x-2, fly_y-2, fly_x+2, fly_y+2], fill="black")
-        
-        # 2. Character Body (Squash and Stretch)
-        # Bouncing beat
-        bounce = abs(math.sin(t))
-        squash_x = 1.0 + (0.1 * bounce)
-        squash_y = 1.0 - (0.1 * bounce)
-        
-        cx, cy = WIDTH//2, HEIGHT - 80
-        radius = 80
-        
+# Palette (Pastel/Flat)
+BG_COLOR = "#FFD1DC" # Pinkish
+BODY_COLOR = "#87CEEB" # Sky Blue
+SHADOW_COLOR = "#5F9EA0" # Darker Blue
+
+def pose(t, width, height):
+    # Everything that moves, as a function of the loop phase t
+    # 1. Fly Movement (Figure 8)
+    fly_x = width//2 + math.cos(t) * 100
+    fly_y = height//2 - 100 + math.sin(t*2) * 50
+
+    # 2. Character Body (Squash and Stretch)
+    # Bouncing beat
+    bounce = abs(math.sin(t))
+    squash_x = 1.0 + (0.1 * bounce)
+    squash_y = 1.0 - (0.1 * bounce)
+    return fly_x, fly_y, squash_x, squash_y
+
+def draw_fly(draw, fly_x, fly_y):
+    # Draw Fly trail
+    draw.line([fly_x-5, fly_y, fly_x+5, fly_y], fill="black", width=1)
+    draw.ellipse([fly_x-2, fly_y-2, fly_x+2, fly_y+2], fill="black")
+
+def draw_shadow(draw, cx, cy, w, h):
+    # Shadow underneath
+    draw.ellipse([cx-w*0.8, cy+h-10, cx+w*0.8, cy+h+10], fill="#E5B7C2")
+
+def draw_body(draw, cx, cy, w, h):
+    # Main Body
+    draw.ellipse([cx-w, cy-h, cx+w, cy+h], fill=BODY_COLOR, outline="black", width=3)
+    # Mouth (Simple Arc; it sits below the eyes, so it can share the body's layer)
+    draw.arc([cx-10, cy+10, cx+10, cy+30], start=0, end=180, fill="black", width=2)
+
+def draw_eyes(draw, cx, eye_spacing, eye_y, look_at):
+    # Face (Eyes tracking fly)
+    draw_eye(draw, cx - eye_spacing, eye_y, 20, look_at)
+    draw_eye(draw, cx + eye_spacing, eye_y, 20, look_at)
+
+@lru_cache(maxsize=4)
+def cartoon_graph(size):
+    """
+    The scene as a retained graph (see scene_graph): each frame only repaints
+    the rectangles around the nodes that moved. One graph per size and process.
+    """
+    width, height = size
+    cx, cy = width//2, height - 80
+    radius = 80
+
+    def body_props(t):
         # Simple transform simulation by drawing oval
-        w = radius * squash_x
-        h = radius * squash_y
-        
-        # Shadow underneath
-        draw.ellipse([cx-w*0.8, cy+h-10, cx+w*0.8, cy+h+10], fill="#E5B7C2")
-        
-        # Main Body
-        draw.ellipse([cx-w, cy-h, cx+w, cy+h], fill=BODY_COLOR, outline="black", width=3)
-        
-        # Face (Eyes tracking fly)
-        eye_spacing = 30 * squash_x
-        eye_y = cy - 20 * squash_y
-        
-        draw_eye(draw, cx - eye_spacing, eye_y, 20, (fly_x, fly_y))
-        draw_eye(draw, cx + eye_spacing, eye_y, 20, (fly_x, fly_y))
-        
-        # Mouth (Simple Arc)
-        draw.arc([cx-10, cy+10, cx+10, cy+30], start=0, end=180, fill="black", width=2)
+        _, _, squash_x, squash_y = pose(t, width, height)
+        return cx, cy, radius * squash_x, radius * squash_y
+
+    def eyes_props(t):
+        fly_x, fly_y, squash_x, squash_y = pose(t, width, height)
+        return cx, 30 * squash_x, cy - 20 * squash_y, (fly_x, fly_y)
+
+    return SceneGraph(size, [
+        Backdrop("background", BG_COLOR),
+        Node("fly", lambda t: pose(t, width, height)[:2], draw_fly,
+             lambda x, y: pixel_box((x-5, y-2, x+5, y+2))),
+        Node("shadow", body_props, draw_shadow,
+             lambda cx, cy, w, h: pixel_box((cx-w*0.8, cy+h-10, cx+w*0.8, cy+h+10))),
+        Node("body", body_props, draw_body,
+             lambda cx, cy, w, h: pixel_box((cx-w, cy-h, cx+w, cy+h), (cx-10, cy+10, cx+10, cy+30))),
+        Node("eyes", eyes_props, draw_eyes,
+             lambda cx, s, y, look_at: pixel_box((cx-s-20, y-20, cx+s+20, y+20))),
+    ])
 
-        images.append(img)
+def draw_cartoon_frame(f, frames=20, size=(WIDTH, HEIGHT)):
+    # Only the fly, the squash and the pupils move; the graph repaints just those
+    # regions and tags the frame with them for the GIF encoder
+    with stage("shapes"):
+        return cartoon_graph(tuple(size)).render(f / frames * 2 * math.pi)
 
-    images[0].save(f"{OUTPUT_DIR}/blobby_cartoon.gif", save_all=True, append_images=images[1:], duration=100, loop=0)
+@cached_render
+def generate_cartoon_character(frames=20, size=None, output_dir=None, workers=1):
+    # Frames stream straight into the GIF as they are rendered, sharing one flat
+    # palette and storing only the regions that changed
+    output_dir = output_dir or OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    images = imap_frames(partial(draw_cartoon_frame, frames=frames, size=size or (WIDTH, HEIGHT)), frames, workers)
+    write_gif(os.path.join(output_dir, "blobby_cartoon.gif"), images, duration=100,
+              optimize=True, colors=(BG_COLOR, BODY_COLOR, "black", "white"))
     print("Generated blobby_cartoon.gif")
 
 if __name__ == "__main__":
@@ -1,65 +1,92 @@
 from manim import *
 
-class CartoonSlime(Scene):
+from scene_profile import ProfiledScene
+
+class CartoonSlime(ProfiledScene, Scene):  # SCENE_PROFILE=檔名.csv 時記錄每個 play/wait 的耗時
+    # 可調參數（預設值即原本的動畫；建構時傳入即可產生變體，見 batch_scenes.py）
+    title = "Cartoon Animation Study"
+    palette = {
+        "body": PINK,
+        "happy": LIGHT_PINK,   # 搖晃時的身體顏色
+        "title": YELLOW,
+        "rainbow": [RED, ORANGE, YELLOW, GREEN, BLUE, PURPLE],
+    }
+    radius = 1.5  # 身體半徑，五官依比例縮放
+    # 各段動畫秒數
+    timings = {"enter": 2, "squash": 1, "sway": 0.5, "jump": 0.5, "spin": 2, "pause": 1, "surprise": 1.5}
+
+    def __init__(self, title=None, palette=None, radius=None, timings=None, **kwargs):
+        super().__init__(**kwargs)
+        if title is not None:
+            self.title = title
+        self.palette = {**type(self).palette, **(palette or {})}
+        if radius is not None:
+            self.radius = radius
+        self.timings = {**type(self).timings, **(timings or {})}
+
     def construct(self):
+        colors = self.palette
+        t = self.timings
+        k = self.radius / 1.5  # 相對於原始尺寸的比例
+
         # 1. 建立角色：一個圓潤的卡通史萊姆 (Slime)
-        body = Circle(radius=1.5, color=PINK, fill_opacity=0.8)
-        eye_l = Dot(point=[-0.5, 0.3, 0], radius=0.2, color=BLACK)
-        eye_r = Dot(point=[0.5, 0.3, 0], radius=0.2, color=BLACK)
-        mouth = Arc(radius=0.5, start_angle=220*DEGREES, angle=100*DEGREES, color=BLACK)
-        mouth.shift(DOWN * 0.2)
-        
+        body = Circle(radius=self.radius, color=colors["body"], fill_opacity=0.8)
+        eye_l = Dot(point=[-0.5 * k, 0.3 * k, 0], radius=0.2 * k, color=BLACK)
+        eye_r = Dot(point=[0.5 * k, 0.3 * k, 0], radius=0.2 * k, color=BLACK)
+        mouth = Arc(radius=0.5 * k, start_angle=220*DEGREES, angle=100*DEGREES, color=BLACK)
+        mouth.shift(DOWN * 0.2 * k)
+
         slime = VGroup(body, eye_l, eye_r, mouth)
-        
+
         # 2. 標題
-        title = Text("Cartoon Animation Study", font_size=36, color=YELLOW).to_edge(UP)
+        title = Text(self.title, font_size=36, color=colors["title"]).to_edge(UP)
 
         # 3. 動畫流程 (總計約 15 秒)
 
         # [0-3s] 史萊姆從下方跳入並打招呼
         self.play(Write(title))
         slime.shift(DOWN * 5)
-        self.play(slime.animate.shift(UP * 5), run_time=2, rate_func=ease_out_back)
-        self.wait(1)
+        self.play(slime.animate.shift(UP * 5), run_time=t["enter"], rate_func=ease_out_back)
+        self.wait(t["pause"])
 
         # [4-7s] 史萊姆開心地左右搖晃 (卡通感擠壓)
         self.play(
-            slime.animate.scale(1.2).set_color(LIGHT_PINK),
-            run_time=1
+            slime.animate.scale(1.2).set_color(colors["happy"]),
+            run_time=t["squash"]
         )
         self.play(
             slime.animate.rotate(20*DEGREES, about_point=slime.get_bottom()),
-            run_time=0.5
+            run_time=t["sway"]
         )
         self.play(
             slime.animate.rotate(-40*DEGREES, about_point=slime.get_bottom()),
-            run_time=1
+            run_time=t["sway"] * 2
         )
         self.play(
             slime.animate.rotate(20*DEGREES, about_point=slime.get_bottom()),
-            run_time=0.5
+            run_time=t["sway"]
         )
-        self.wait(1)
+        self.wait(t["pause"])
 
         # [8-11s] 史萊姆變換表情 (驚訝)
-        new_mouth = Circle(radius=0.2, color=BLACK).shift(DOWN * 0.3)
+        new_mouth = Circle(radius=0.2 * k, color=BLACK).shift(DOWN * 0.3 * k)
         self.play(Transform(mouth, new_mouth))
-        self.play(slime.animate.shift(UP * 1), run_time=0.5, rate_func=there_and_back)
-        self.wait(1.5)
+        self.play(slime.animate.shift(UP * 1), run_time=t["jump"], rate_func=there_and_back)
+        self.wait(t["surprise"])
 
         # [12-15s] 史萊姆旋轉並變成彩虹圖案消失
-        rainbow_colors = [RED, ORANGE, YELLOW, GREEN, BLUE, PURPLE]
+        rainbow_colors = colors["rainbow"]
         rainbow_group = VGroup(*[
-            Circle(radius=1.5 - i*0.2, color=rainbow_colors[i], fill_opacity=0.5)
+            Circle(radius=(1.5 - i*0.2) * k, color=rainbow_colors[i], fill_opacity=0.5)
             for i in range(len(rainbow_colors))
         ])
-        
+
         self.play(FadeOut(eye_l), FadeOut(eye_r), FadeOut(mouth))
         self.play(ReplacementTransform(body, rainbow_group))
         self.play(
             Rotate(rainbow_group, angle=PI*2),
             rainbow_group.animate.scale(0),
             FadeOut(title),
-            run_time=2
+            run_time=t["spin"]
         )
-        self.wait(1)
+        self.wait(t["pause"])
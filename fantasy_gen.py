@@ -3,60 +3,83 @@ from PIL import Image, ImageDraw
 import random
 import math
 import os
+from functools import lru_cache, partial
+
+from frame_sinks import EXTENSIONS, open_sink
+from bloom import add_glow
+from frame_pool import buffer, image_from
+from gif_writer import clip_palette, snap_to_palette, write_gif
+from gradient import vertical_gradient
+from instrument import stage
+from layers import composite, static_layer
+from masks import polygon_mask
+from noise import value_noise
+from render_cache import cached_render
+from render_farm import frame_rng, imap_frames
 
 # Config
 WIDTH, HEIGHT = 320, 180
 SCALE = 2
 OUTPUT_DIR = "fantasy_art"
-
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
+SEED = 0  # Base seed for the per-frame random streams
+GLOW_STRENGTH = 2.0  # Crystal glow brightness at mid pulse (see bloom.add_glow)
+PALETTE_SAMPLES = 8  # Crystal cave frames sampled for its GIF palette
+CAVE_COLORS = [(20, 10, 30), (10, 5, 15), (0, 255, 255), (255, 0, 255), (100, 255, 100), (255, 255, 255)]  # Kept exact in the GIF
 
 # --- Utilities ---
+def output_path(output_dir, filename):
+    output_dir = output_dir or OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, filename)
+
+def save_frames(images, stem, duration, scale, output_dir, output_format="gif", output=None):
+    # GIF keeps the shared palette, changed-region frames and duplicate collapsing;
+    # the other formats (see frame_sinks) hand full-color frames to a video pipeline.
+    # `output` overrides the file, e.g. "-" for stdout or a named pipe.
+    path = output or output_path(output_dir, stem + EXTENSIONS[output_format])
+    if output_format == "gif":
+        write_gif(path, images, duration=duration, scale=scale, optimize=True)
+    else:
+        with open_sink(output_format, path, duration=duration, scale=scale) as sink:
+            for img in images:
+                sink.write(img)
+    print(f"Generated {path}")
+
 def lerp_color(c1, c2, t):
     return tuple(int(a + (b - a) * t) for a, b in zip(c1, c2))
 
 def smooth_noise(x, seed):
-    random.seed(seed)
-    # Simple 1D noise smoothing
-    i = int(x)
-    f = x - i
-    v1 = random.random()
-    random.seed(seed + 1)
-    v2 = random.random()
-    return v1 * (1-f) + v2 * f
+    # Smooth 1D value noise in [0, 1]; x may be a scalar or a whole array of positions
+    return value_noise(x, seed=seed)
 
 # --- Scene 1: Floating Sky Island (Fantasy) ---
-def generate_sky_island(frames=30):
-    images = []
-    for f in range(frames):
-        # Soft Pastel Sky (Pink -> Blue)
-        img = Image.new('RGB', (WIDTH, HEIGHT))
-        pixels = img.load()
-        
-        for y in range(HEIGHT):
-            t = y / HEIGHT
-            col = lerp_color((135, 206, 235), (255, 182, 193), t) # SkyBlue -> LightPink
-            for x in range(WIDTH):
-                pixels[x, y] = col
-        
+@lru_cache(maxsize=None)
+def sky_background(width, height):
+    # Soft Pastel Sky (Pink -> Blue), identical every frame so build it once
+    return np.ascontiguousarray(vertical_gradient(width, height, [(135, 206, 235), (255, 182, 193)], haze=0)[0]) # SkyBlue -> LightPink
+
+def draw_sky_island(f, frames=30, size=(WIDTH, HEIGHT)):
+    width, height = size
+    with stage("background"):
+        img = Image.fromarray(sky_background(width, height))
         draw = ImageDraw.Draw(img)
-        
+    
+    with stage("shapes"):
         # Floating Island
         t_float = math.sin(f / frames * 2 * math.pi) * 5 # Bobbing up and down
-        ix, iy = WIDTH//2, HEIGHT//2 + int(t_float)
-        
+        ix, iy = width//2, height//2 + int(t_float)
+    
         # Island Base (Green top, Brown bottom)
         draw.ellipse([ix-40, iy-20, ix+40, iy+20], fill=(100, 200, 100)) # Grass
         draw.polygon([(ix-30, iy+10), (ix+30, iy+10), (ix, iy+50)], fill=(100, 70, 50)) # Earth spike
-        
+    
         # Magical Tree
         tx, ty = ix, iy-10
         draw.rectangle([tx-3, ty-30, tx+3, ty], fill=(80, 50, 30)) # Trunk
         # Glowing Leaves
         leaf_color = lerp_color((255, 100, 200), (200, 100, 255), (math.sin(f/5)+1)/2)
         draw.ellipse([tx-20, ty-50, tx+20, ty-20], fill=leaf_color)
-        
+    
         # Falling Petals (Particles)
         for p in range(10):
             px = ix + math.sin(p*13 + f*0.1) * 30
@@ -65,69 +88,101 @@ def generate_sky_island(frames=30):
 
         # Clouds (White fluffy)
         for c in range(3):
-            cx = (c * 100 + f) % (WIDTH + 100) - 50
+            cx = (c * 100 + f) % (width + 100) - 50
             cy = 40 + c * 30
             draw.ellipse([cx, cy, cx+60, cy+30], fill=(255, 255, 255, 200))
 
-        images.append(img.resize((WIDTH*SCALE, HEIGHT*SCALE), Image.NEAREST))
-    
-    images[0].save(f"{OUTPUT_DIR}/sky_island.gif", save_all=True, append_images=images[1:], duration=100, loop=0)
-    print("Generated sky_island.gif")
+    return img
+
+@cached_render
+def generate_sky_island(frames=30, size=None, scale=None, output_dir=None, workers=1, output_format="gif", output=None):
+    # Frames stream straight into the output as they are rendered; the encoder
+    # does the Nearest Neighbor scale-up, so frames stay at native resolution.
+    # As a GIF, scene colors fit one shared palette and only changed regions are stored.
+    images = imap_frames(partial(draw_sky_island, frames=frames, size=size or (WIDTH, HEIGHT)), frames, workers)
+    save_frames(images, "sky_island", 100, scale or SCALE, output_dir, output_format, output)
 
 # --- Scene 2: Crystal Cave (Magical) ---
-def generate_crystal_cave(frames=20):
-    images = []
-    for f in range(frames):
-        # Dark Cave BG
-        img = Image.new('RGB', (WIDTH, HEIGHT), (20, 10, 30))
-        draw = ImageDraw.Draw(img)
-        
-        # Crystals
-        crystals = [
-            (50, 140, 20, (0, 255, 255)), # Cyan
-            (160, 130, 30, (255, 0, 255)), # Magenta
-            (270, 150, 25, (100, 255, 100)) # Green
-        ]
-        
+def draw_ceiling(draw, size, seed=7):
+    # Stalactites (Top), seeded so the ceiling is the same every frame
+    rng = random.Random(seed)
+    w, h = size
+    draw.polygon([(0,0), (w, 0), (w, 30), (0, 30)], fill=(10, 5, 15))
+    for i in range(0, w, 20):
+        draw.polygon([(i, 0), (i+20, 0), (i+10, rng.randint(20, 50))], fill=(10, 5, 15))
+
+@lru_cache(maxsize=None)
+def cave_background(width, height):
+    # Dark Cave BG with the ceiling rasterized once. Crystals and sparkles sit
+    # well below the stalactites, so drawing them over it keeps the old stacking.
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:] = (20, 10, 30)
+    return composite(background, static_layer(draw_ceiling, (width, height), (width, height)))
+
+def crystal_points(cx, cy, h):
+    return [
+        (cx, cy-h),
+        (cx+10, cy-h+10),
+        (cx+10, cy),
+        (cx-10, cy),
+        (cx-10, cy-h+10)
+    ]
+
+def draw_crystal_cave(f, frames=20):
+    with stage("background"):
+        pixels = buffer((HEIGHT, WIDTH, 3), fill=cave_background(WIDTH, HEIGHT))
+        rng = frame_rng(SEED, f)
+
+    # Crystals
+    crystals = [
+        (50, 140, 20, (0, 255, 255)), # Cyan
+        (160, 130, 30, (255, 0, 255)), # Magenta
+        (270, 150, 25, (100, 255, 100)) # Green
+    ]
+
+    with stage("glow"):
         for i, (cx, cy, h, color) in enumerate(crystals):
             # Pulse glow
             pulse = (math.sin(f/frames * 2 * math.pi + i) + 1) / 2
             glow_radius = 10 + pulse * 10
-            
-            # Draw Glow (Soft circle behind)
-            # PIL doesn't do soft gradients easily, use multiple circles
-            for r in range(int(glow_radius), 0, -2):
-                alpha = int(50 * (1 - r/glow_radius))
-                # Note: PIL default draw doesn't support alpha on RGB image directly without RGBA conversion
-                # Simulating with solid rings for pixel art style
-                pass 
-            
+
+            # Soft glow behind: the crystal's own light, blurred (bloom.add_glow)
+            # and added onto the cave. Bigger pulses spread wider and shine brighter.
+            x0, y0 = cx - 10, cy - h
+            mask = polygon_mask(tuple((x - x0, y - y0) for x, y in crystal_points(cx, cy, h)), coverage=True)
+            light = mask.alpha[..., None] * (np.array(color, dtype=np.float32) / 255)
+            add_glow(pixels, light, x0 + mask.x0, y0 + mask.y0, glow_radius / 2, GLOW_STRENGTH * (0.5 + pulse))
+
+    with stage("shapes"):
+        img = image_from(pixels)
+        draw = ImageDraw.Draw(img)
+        for i, (cx, cy, h, color) in enumerate(crystals):
             # Crystal Shape
-            poly = [
-                (cx, cy-h),
-                (cx+10, cy-h+10),
-                (cx+10, cy),
-                (cx-10, cy),
-                (cx-10, cy-h+10)
-            ]
-            draw.polygon(poly, fill=color)
-            
+            draw.polygon(crystal_points(cx, cy, h), fill=color)
+        
             # Sparkles
             if f % 10 == i * 3 % 10:
-                sx = cx + random.randint(-15, 15)
-                sy = cy - h/2 + random.randint(-15, 15)
+                sx = cx + rng.randint(-15, 15)
+                sy = cy - h/2 + rng.randint(-15, 15)
                 draw.line([sx-2, sy, sx+2, sy], fill=(255, 255, 255), width=1)
                 draw.line([sx, sy-2, sx, sy+2], fill=(255, 255, 255), width=1)
 
-        # Stalactites (Top)
-        draw.polygon([(0,0), (WIDTH, 0), (WIDTH, 30), (0, 30)], fill=(10, 5, 15))
-        for i in range(0, WIDTH, 20):
-            draw.polygon([(i, 0), (i+20, 0), (i+10, random.randint(20, 50))], fill=(10, 5, 15))
-
-        images.append(img.resize((WIDTH*SCALE, HEIGHT*SCALE), Image.NEAREST))
+    return img
 
-    images[0].save(f"{OUTPUT_DIR}/crystal_cave.gif", save_all=True, append_images=images[1:], duration=150, loop=0)
-    print("Generated crystal_cave.gif")
+@cached_render
+def generate_crystal_cave(frames=20, scale=None, output_dir=None, workers=1, output_format="gif", output=None):
+    # Frames stream straight into the output as they are rendered; the encoder
+    # does the Nearest Neighbor scale-up, so frames stay at native resolution.
+    # As a GIF, scene colors fit one shared palette and only changed regions are stored.
+    images = imap_frames(partial(draw_crystal_cave, frames=frames), frames, workers)
+    if output_format == "gif":
+        # The glow brings hundreds of colors; one palette sampled across the pulse
+        # cycle keeps every frame on the shared palette (see gif_writer.clip_palette)
+        with stage("palette"):
+            samples = [draw_crystal_cave(f, frames) for f in range(0, frames, max(1, frames // PALETTE_SAMPLES))]
+            palette = clip_palette(samples, CAVE_COLORS)
+        images = (snap_to_palette(img, palette) for img in images)
+    save_frames(images, "crystal_cave", 150, scale or SCALE, output_dir, output_format, output)
 
 if __name__ == "__main__":
     generate_sky_island()
@@ -1,123 +1,230 @@
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter
-import random
+from PIL import Image
 import math
 import os
+from functools import partial
+
+from bloom import bloom
+from flow_grid import FlowGridCache
+from frame_pool import buffer, image_from, release
+from frame_store import CHECKPOINT_EVERY, FrameStore
+from frame_sinks import open_sink, sink_path
+from gif_writer import PaletteSnap, clip_palette
+from instrument import set_frame, stage
+from noise import fractal_noise, gradient_noise
+from particles import ParticleSystem
+from raster import draw_segments
+from render_cache import cached_render, source_digest
+from tiled_flow import imap_tiled_frames
 
 # Config - High Quality Flow Field
 WIDTH, HEIGHT = 480, 270
 SCALE = 1
 FRAMES = 60
 PARTICLE_COUNT = 4000
+CELL = 10             # Flow grid cell size in pixels
+BILINEAR = False      # Interpolate the flow grid instead of nearest-cell lookup
+TIME_STEP = 0.1       # Field time advanced per frame
+FIELD_PERIOD = 4 * math.pi  # The field repeats after this much time (seamless loop)
+BLEND = "add"         # Trail blending: "add" (glowy overlaps) or "max"
+FADE = 0.9            # Share of the previous frame kept each frame (trail length)
+BACKGROUND = (5, 5, 10)
+GLOW = 0.6            # Bloom strength on bright trails (0 turns the glow off)
+GLOW_THRESHOLD = 120  # Channel value where trails start to glow
+GLOW_RADIUS = 4       # Glow spread in pixels
+TILE_SIZE = None      # (w, h) per tile worker; None splits the canvas into one tile per worker
+FIELD = "trig"        # Flow field: "trig" (stacked waves) or "noise" (3D gradient noise)
+NOISE_SCALE = 80      # Pixels per noise lattice cell (noise field)
+NOISE_LOOP_CELLS = 2  # Lattice cells the noise field travels through per period
+SEED = 0
+PALETTE_FRAMES = (12, 24)  # Preview frames sampled for the GIF palette (trails are fully grown by then)
 OUTPUT_DIR = "artistic_gen"
 
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
-
-class Particle:
-    def __init__(self):
-        self.reset()
-        
-    def reset(self):
-        self.x = random.uniform(0, WIDTH)
-        self.y = random.uniform(0, HEIGHT)
-        self.vx = 0
-        self.vy = 0
-        # Color based on position (Nebula gradient)
-        self.color = self.get_color()
-        self.age = 0
-        self.max_age = random.uniform(20, 60)
-
-    def get_color(self):
-        # Center is Cyan, Edges are Magenta/Purple
-        dist = math.sqrt((self.x - WIDTH/2)**2 + (self.y - HEIGHT/2)**2)
-        norm_dist = min(dist / (WIDTH/2), 1.0)
-        
-        # Cyan (0, 255, 255) -> Purple (150, 0, 200)
-        r = int(0 * (1-norm_dist) + 150 * norm_dist)
-        g = int(255 * (1-norm_dist) + 0 * norm_dist)
-        b = int(255 * (1-norm_dist) + 200 * norm_dist)
-        return (r, g, b)
-
-    def update(self, flow_grid, cols, rows):
-        # Map pos to grid
-        c = int(self.x / 10)
-        r = int(self.y / 10)
-        if c >= 0 and c < cols and r >= 0 and r < rows:
-            angle = flow_grid[r][c]
-            # Accelerate in direction
-            self.vx += math.cos(angle) * 0.5
-            self.vy += math.sin(angle) * 0.5
-            
-        # Friction
-        self.vx *= 0.8
-        self.vy *= 0.8
-        
-        self.x += self.vx
-        self.y += self.vy
-        self.age += 1
-        
-        # Respawn if out of bounds or too old
-        if (self.x < 0 or self.x > WIDTH or 
-            self.y < 0 or self.y > HEIGHT or 
-            self.age > self.max_age):
-            self.reset()
-
-def get_flow_grid(t):
-    cols = WIDTH // 10 + 1
-    rows = HEIGHT // 10 + 1
-    grid = np.zeros((rows, cols))
+def nebula_color(x, y, width=WIDTH, height=HEIGHT):
+    # Center is Cyan, Edges are Magenta/Purple
+    dist = np.sqrt((x - width/2)**2 + (y - height/2)**2)
+    norm_dist = np.minimum(dist / (width/2), 1.0)[:, None]
+    
+    # Cyan (0, 255, 255) -> Purple (150, 0, 200)
+    cyan = np.array([0, 255, 255])
+    purple = np.array([150, 0, 200])
+    return (cyan * (1-norm_dist) + purple * norm_dist).astype(np.uint8)
+
+def get_flow_grid(t, cell=CELL, width=WIDTH, height=HEIGHT, x0=0, y0=0):
+    # t may be a scalar or an array shaped to broadcast, e.g. (steps, 1, 1)
+    # (x0, y0) is the grid's top-left in canvas pixels (a multiple of cell), for tiles
+    cols = width // cell + 1
+    rows = height // cell + 1
+    # Grid coordinates in units of the original 10px cells, so finer cells sample the same pattern
+    c = (x0 // cell + np.arange(cols)) * (cell / 10)
+    r = ((y0 // cell + np.arange(rows)) * (cell / 10))[:, None]
+    t = np.asarray(t)
     
     # Complex trigonometry for "organic" flow without external noise lib
-    for r in range(rows):
-        for c in range(cols):
-            # 3-Layer wave interference
-            val = math.sin(c * 0.1 + t) * math.cos(r * 0.1 + t/2)
-            val += math.sin(c * 0.3 - t) * 0.5
-            val += math.cos(r * 0.2 + c * 0.2) * 0.3
-            
-            # Map to angle (0 - 2PI)
-            grid[r][c] = val * math.pi * 2
-    return grid, cols, rows
-
-def generate_flow_field_art():
-    print("Generating Flow Field Animation...")
-    particles = [Particle() for _ in range(PARTICLE_COUNT)]
+    # 3-Layer wave interference
+    val = (np.sin(c * 0.1 + t) * np.cos(r * 0.1 + t/2)
+           + np.sin(c * 0.3 - t) * 0.5
+           + np.cos(r * 0.2 + c * 0.2) * 0.3)
     
-    images = []
-    # Use a persistent canvas for "trails" effect
-    canvas = Image.new('RGB', (WIDTH, HEIGHT), (5, 5, 10))
+    # Map to angle (0 - 2PI)
+    return val * np.pi * 2
+
+def noise_flow_grid(t, cell=CELL, width=WIDTH, height=HEIGHT, x0=0, y0=0, seed=SEED):
+    # Same contract as get_flow_grid, but the angles come from 3D gradient noise.
+    # Time tiles every FIELD_PERIOD (the lattice wraps), so the loop stays seamless.
+    cols = width // cell + 1
+    rows = height // cell + 1
+    x = (x0 // cell + np.arange(cols)) * cell / NOISE_SCALE
+    y = ((y0 // cell + np.arange(rows)) * cell / NOISE_SCALE)[:, None]
+    z = np.asarray(t) / FIELD_PERIOD * NOISE_LOOP_CELLS
+    val = fractal_noise(gradient_noise, x, y, z, octaves=3, seed=seed, period=(None, None, NOISE_LOOP_CELLS))
+    return val * np.pi * 2
+
+def glow(pixels):
+    # Bloom on a finished uint8 frame, in place
+    if GLOW:
+        bloom(pixels, GLOW_THRESHOLD, GLOW_RADIUS, GLOW)
+    return pixels
+
+FLOW_FIELDS = {"trig": get_flow_grid, "noise": noise_flow_grid}
+
+def new_simulation(width, height, particle_count):
+    """The particles, flow grids and float trail canvas for frame 0 of the serial simulation."""
+    particles = ParticleSystem(particle_count, width, height,
+                               colorize=partial(nebula_color, width=width, height=height), seed=SEED)
+    # Every grid of one field period, computed up front
+    flow = FlowGridCache(partial(FLOW_FIELDS[FIELD], cell=CELL, width=width, height=height), FIELD_PERIOD, TIME_STEP)
+    # Use a persistent canvas for "trails" effect (float accumulation buffer)
+    canvas = np.empty((height, width, 3), dtype=np.float32)
+    canvas[:] = BACKGROUND
+    return particles, flow, canvas
+
+def render_frame(f, canvas, particles, flow):
+    """Advances the simulation by frame f and returns it as a pooled uint8 buffer (see frame_pool)."""
+    # 1. Fade previous frame slightly (Trails effect)
+    with stage("background"):
+        canvas *= FADE  # Fade factor (Keep 90% of previous image)
+
+    # 2. Look up Vector Field (wraps around the cached period)
+    with stage("simulate"):
+        ux, uy = flow.vectors(f)
+
+        # 3. Update & Draw Particles (all at once)
+        prev_x, prev_y = particles.update(ux, uy, CELL, bilinear=BILINEAR)
+
+    # Draw every line segment in one call
+    # Opacity based on age (fade in/out)
+    with stage("shapes"):
+        alpha = particles.alpha()
+        visible = alpha > 0
+        draw_segments(canvas, prev_x[visible], prev_y[visible],
+                      particles.x[visible], particles.y[visible],
+                      particles.color[visible], alpha[visible] / 255, mode=BLEND)
+
+    with stage("convert"):
+        # One pass from the float canvas into a recycled uint8 buffer
+        pixels = np.clip(canvas, 0, 255, out=buffer(canvas.shape), casting='unsafe')
+
+    # 4. Final Polish: glow around the bright trails (the canvas itself stays unblurred)
+    with stage("glow"):
+        glow(pixels)
+    return pixels
+
+def trail_palette(width, height, particle_count, frames):
+    """
+    One GIF palette for the animation, from a short preview of the serial
+    simulation. Faded, overlapping and glowing trails bring tens of thousands of
+    colors per frame; snapped onto this palette every frame fits the GIF's
+    shared palette instead of being quantized rectangle by rectangle.
+    """
+    particles, flow, canvas = new_simulation(width, height, particle_count)
+    sampled = [f for f in PALETTE_FRAMES if f < frames] or [frames - 1]
+    samples = []
+    for f in range(max(sampled) + 1):
+        pixels = render_frame(f, canvas, particles, flow)
+        if f in sampled:
+            samples.append(Image.fromarray(pixels.copy()))
+        release(pixels)
+    return clip_palette(samples, [BACKGROUND])
+
+# workers != 1 switches to the tiled simulation, which renders different frames
+@cached_render(keep=("workers",))
+def generate_flow_field_art(frames=FRAMES, size=None, particle_count=PARTICLE_COUNT, output_dir=None,
+                            output_format="gif", output=None, workers=1, tile_size=TILE_SIZE,
+                            store=None, checkpoint_every=CHECKPOINT_EVERY):
+    print("Generating Flow Field Animation...")
+    width, height = size or (WIDTH, HEIGHT)
+    output_dir = output_dir or OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = output or sink_path(output_dir, "nebula_flow", output_format)
+    if (workers != 1 or tile_size) and store:
+        raise ValueError("a frame store needs workers=1 and no tile_size (tile state lives in the workers)")
+
+    # As a GIF every frame is snapped onto one palette (see trail_palette), so the
+    # whole animation stays on the GIF's shared palette; the other formats get the
+    # full-color frames
+    gif_options, to_output = {}, lambda img: img
+    if output_format == "gif":
+        with stage("palette"):
+            palette = trail_palette(width, height, particle_count, frames)
+        gif_options = dict(optimize=True, colors=palette.tolist())
+        to_output = PaletteSnap(palette)
+
+    if workers != 1 or tile_size:
+        # Large canvases: every tile simulates and rasterizes in its own worker
+        config = dict(field=FLOW_FIELDS[FIELD], cell=CELL, period=FIELD_PERIOD, time_step=TIME_STEP,
+                      bilinear=BILINEAR, blend=BLEND, fade=FADE, background=BACKGROUND, seed=SEED,
+                      colorize=partial(nebula_color, width=width, height=height))
+        with open_sink(output_format, output_path, duration=60, scale=SCALE, **gif_options) as sink:
+            for frame in imap_tiled_frames(frames, (width, height), particle_count, config, tile_size, workers):
+                # The glow spreads across tile borders, so it runs on the stitched frame
+                with stage("glow"):
+                    glow(frame)
+                sink.write(to_output(Image.fromarray(frame)))
+        print(f"Saved {output_path}")
+        return
+
+    particles, flow, canvas = new_simulation(width, height, particle_count)
+
+    # GIF by default; raw RGB/RGBA, Y4M or a PNG sequence feed a video pipeline
+    # without quantizing (output may be "-" for stdout or a named pipe)
+    # (with a frame store it is only opened once every frame is on disk)
+    sink = None if store else open_sink(output_format, output_path, duration=60, scale=SCALE, **gif_options)
+
+    # With a store, frames go to a memory-mapped file first and the simulation
+    # is checkpointed, so rerunning an interrupted render resumes from there
+    start = 0
+    if store:
+        store = FrameStore(store, (height, width, 3), params=dict(
+            size=[width, height], particle_count=particle_count, source=source_digest(__name__)))
+        state = store.resume()
+        if state is not None:
+            start = len(store)
+            canvas[:] = state["canvas"]
+            particles.restore(state)
+            print(f"Resuming from frame {start}")
     
-    for f in range(FRAMES):
-        # 1. Fade previous frame slightly (Trails effect)
-        # Convert to numpy to multiply opacity
-        arr = np.array(canvas).astype(float)
-        arr *= 0.9  # Fade factor (Keep 90% of previous image)
-        canvas = Image.fromarray(arr.astype(np.uint8))
-        draw = ImageDraw.Draw(canvas)
-        
-        # 2. Update Vector Field
-        t = f * 0.1
-        grid, cols, rows = get_flow_grid(t)
-        
-        # 3. Update & Draw Particles
-        for p in particles:
-            prev_x, prev_y = p.x, p.y
-            p.update(grid, cols, rows)
-            
-            # Draw line segment
-            # Opacity based on age (fade in/out)
-            alpha = int(255 * math.sin(p.age / p.max_age * math.pi))
-            if alpha > 0:
-                # Add "bloom" pixel
-                draw.line([prev_x, prev_y, p.x, p.y], fill=p.color, width=1)
-        
-        # 4. Final Polish: Mild Blur/Glow simulation
-        # Only save every frame directly
-        images.append(canvas.copy())
-
-    output_path = f"{OUTPUT_DIR}/nebula_flow.gif"
-    images[0].save(output_path, save_all=True, append_images=images[1:], duration=60, loop=0)
+    for f in range(start, frames):
+        set_frame(f)
+        pixels = render_frame(f, canvas, particles, flow)
+        # Only save every frame directly (streamed to disk, nothing kept in memory)
+        if store is None:
+            sink.write(to_output(image_from(pixels)))
+            continue
+        with stage("store"):
+            store.append(pixels)
+            release(pixels)
+            if (f + 1) % checkpoint_every == 0 or f + 1 == frames:
+                store.checkpoint(canvas=canvas, **particles.snapshot())
+
+    if store is not None:
+        # Encoded from disk; the frames are never all in memory
+        with store:
+            sink = open_sink(output_format, output_path, duration=60, scale=SCALE, **gif_options)
+            for f, frame in enumerate(store.frames(stop=frames)):
+                set_frame(f)
+                sink.write(to_output(Image.fromarray(frame)))
+    sink.close()
     print(f"Saved {output_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+import numpy as np
+
+# --- Time-Cached Flow Grids ---
+class FlowGridCache:
+    """
+    Stack of flow grids precomputed once over one period of the field's time parameter.
+    Grids are stored as unit direction vectors (ux, uy) so particles never pay for trig,
+    and frame lookups wrap around the stack for seamless loops.
+    """
+
+    def __init__(self, field_fn, period, time_step):
+        # field_fn(t) must broadcast over a (steps, 1, 1) array of times
+        self.steps = max(1, int(round(period / time_step)))
+        self.times = np.arange(self.steps) * (period / self.steps)
+        angles = field_fn(self.times[:, None, None])
+        self.ux = np.cos(angles).astype(np.float32)
+        self.uy = np.sin(angles).astype(np.float32)
+
+    def __len__(self):
+        return self.steps
+
+    def vectors(self, frame):
+        """Returns the (ux, uy) grids for a frame index, wrapping around the period."""
+        i = frame % self.steps
+        return self.ux[i], self.uy[i]
+
+# --- Samplers ---
+def sample_nearest(ux, uy, x, y, cell):
+    """Nearest-cell lookup. Returns (ax, ay, inside) for the particles inside the grid."""
+    rows, cols = ux.shape
+    c = (x / cell).astype(np.intp)
+    r = (y / cell).astype(np.intp)
+    inside = (c >= 0) & (c < cols) & (r >= 0) & (r < rows)
+    r, c = r[inside], c[inside]
+    return ux[r, c], uy[r, c], inside
+
+def sample_bilinear(ux, uy, x, y, cell):
+    """Bilinear lookup between the four surrounding grid nodes. Same return as sample_nearest."""
+    rows, cols = ux.shape
+    gx, gy = x / cell, y / cell
+    inside = (gx >= 0) & (gx < cols) & (gy >= 0) & (gy < rows)
+    gx, gy = gx[inside], gy[inside]
+
+    c0 = np.minimum(gx.astype(np.intp), max(cols - 2, 0))
+    r0 = np.minimum(gy.astype(np.intp), max(rows - 2, 0))
+    c1 = np.minimum(c0 + 1, cols - 1)
+    r1 = np.minimum(r0 + 1, rows - 1)
+    fx = np.clip(gx - c0, 0, 1)
+    fy = np.clip(gy - r0, 0, 1)
+
+    def lerp2(g):
+        top = g[r0, c0] * (1 - fx) + g[r0, c1] * fx
+        bottom = g[r1, c0] * (1 - fx) + g[r1, c1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    return lerp2(ux), lerp2(uy), inside
@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image
+
+# --- Reusable Frame Buffers ---
+# Per-frame canvases, scratch space and rasterization targets come from pools
+# instead of fresh allocations. Whoever takes a buffer owns it until it calls
+# release(); only then can the buffer be handed out again, so it must not be
+# released while an array view or a Pillow image sharing its memory is still
+# in use. Buffers that are never released are simply garbage collected.
+POOL_LIMIT = 8  # Released buffers kept per shape; past that, release() drops them
+
+class FramePool:
+    """Recycles NumPy buffers of one shape and dtype (contents are left as they were)."""
+
+    def __init__(self, shape, dtype=np.uint8, limit=POOL_LIMIT):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.limit = limit
+        self._free = []
+
+    def acquire(self):
+        if self._free:
+            return self._free.pop()
+        return np.empty(self.shape, dtype=self.dtype)
+
+    def release(self, buf):
+        if buf.shape != self.shape or buf.dtype != self.dtype:
+            raise ValueError(f"Buffer {buf.shape} {buf.dtype} does not belong to this pool")
+        if len(self._free) < self.limit and not any(b is buf for b in self._free):
+            self._free.append(buf)
+
+_pools = {}
+
+def _pool(shape, dtype):
+    key = (tuple(shape), np.dtype(dtype))
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = FramePool(*key)
+    return pool
+
+def buffer(shape, dtype=np.uint8, fill=None):
+    """
+    A pooled buffer of the given shape, optionally filled with a color or an
+    array. The caller owns it until it passes it to release().
+    """
+    buf = _pool(shape, dtype).acquire()
+    if fill is not None:
+        np.copyto(buf, fill, casting='unsafe')
+    return buf
+
+def release(buf):
+    """Returns a buffer from buffer() to its pool; nothing may use it afterwards."""
+    _pool(buf.shape, buf.dtype).release(buf)
+
+@contextmanager
+def borrowed(shape, dtype=np.uint8, fill=None):
+    """A pooled buffer for the duration of a with block (see buffer)."""
+    buf = buffer(shape, dtype, fill)
+    try:
+        yield buf
+    finally:
+        release(buf)
+
+def image_from(buf):
+    """A new Pillow image with the contents of a pooled buffer, which goes back to its pool."""
+    img = Image.fromarray(buf)
+    if img.readonly:
+        img = img.copy()  # fromarray shares the memory of (H, W, 4) and (H, W) arrays
+    release(buf)
+    return img
+
+# --- NumPy <-> Pillow Without Copies ---
+def image_view(buf):
+    """
+    A writable Pillow image over an (H, W) or (H, W, 4) uint8 array, sharing its
+    memory: drawing on the image changes the array and vice versa. Four-channel
+    buffers map as RGBA, which is also how Pillow stores RGB internally.
+    """
+    if buf.dtype != np.uint8 or not buf.flags.c_contiguous or buf.ndim not in (2, 3):
+        raise ValueError("image_view needs a C-contiguous (H, W) or (H, W, 4) uint8 array")
+    if buf.ndim == 3 and buf.shape[2] != 4:
+        raise ValueError("Pillow can only share (H, W, 4) color buffers, not (H, W, %d)" % buf.shape[2])
+    mode = 'L' if buf.ndim == 2 else 'RGBA'
+    img = Image.frombuffer(mode, (buf.shape[1], buf.shape[0]), buf, 'raw', mode, 0, 1)
+    img.readonly = 0  # frombuffer marks mapped images read-only; the memory is ours
+    return img
+
+# --- Fixed-Point Pixel Math ---
+def _div255(x):
+    # x // 255 for 0 <= x <= 65152, in place on a uint16 array
+    t = x >> 8
+    x += 1
+    x += t
+    x >>= 8
+    return x
+
+def blend(dst, src, alpha):
+    """
+    dst = round(src * a + dst * (255 - a)) / 255, in place on uint8 arrays with a
+    (H, W, 1) or (H, W) uint8 alpha. Intermediates stay in pooled uint16 scratch.
+    """
+    a = alpha if alpha.ndim == dst.ndim else alpha[..., None]
+    with borrowed(dst.shape, np.uint16) as acc, borrowed(dst.shape, np.uint16) as rest:
+        np.multiply(dst, a, out=acc, dtype=np.uint16)
+        np.multiply(dst, 255, out=rest, dtype=np.uint16)
+        rest -= acc                                      # dst * (255 - a)
+        np.multiply(src, a, out=acc, dtype=np.uint16)
+        acc += rest
+        acc += 127
+        np.copyto(dst, _div255(acc), casting='unsafe')
+    return dst
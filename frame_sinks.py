@@ -0,0 +1,167 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+import numpy as np
+from PIL import Image
+
+from gif_writer import GifWriter
+from instrument import stage
+from output_formats import EXTENSIONS, FORMATS, STDOUT
+
+# --- Frame Outputs Besides GIF ---
+# Every sink takes native-resolution frames through write(frame) and upscales
+# them by an integer `scale` (nearest neighbor), like GifWriter. Raw and Y4M
+# streams go to a file, a named pipe (opened like a file, so it blocks until a
+# reader attaches) or "-" for stdout (see output_formats).
+
+def upscale_rgb(arr, scale):
+    """Integer nearest-neighbor upscale of an (H, W, C) array."""
+    if scale == 1:
+        return arr
+    return np.repeat(np.repeat(arr, scale, axis=1), scale, axis=0)
+
+class _Stream:
+    """
+    Binary output for the raw sinks. "-" is the process's real stdout, even if
+    sys.stdout was redirected; callers streaming to stdout should send their
+    own text output elsewhere (the render CLI redirects print() to stderr).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if path == STDOUT:
+            self.fp = sys.__stdout__.buffer
+        else:
+            self.fp = open(path, 'wb')
+
+    def close(self):
+        if self.path == STDOUT:
+            self.fp.flush()
+        elif not self.fp.closed:
+            self.fp.close()
+
+class _Sink:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _prepare(self, frame, mode):
+        with stage("convert"):
+            arr = np.asarray(frame if frame.mode == mode else frame.convert(mode))
+        with stage("scale"):
+            arr = upscale_rgb(arr, self.scale)
+        size = (arr.shape[1], arr.shape[0])
+        if self.size is None:
+            self.size = size
+        elif size != self.size:
+            raise ValueError(f"Frame size {size} does not match stream size {self.size}")
+        return arr
+
+class RawWriter(_Sink):
+    """
+    Streams frames as headerless interleaved RGB or RGBA bytes, row by row.
+    Consumers need the size up front, e.g.
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 640x360 -r 10 -i - out.mp4
+    """
+
+    def __init__(self, path, mode='RGB', scale=1):
+        self.mode = mode
+        self.scale = scale
+        self.size = None
+        self.frame_count = 0
+        self._stream = _Stream(path)
+
+    def write(self, frame, duration=None, key=None):
+        arr = self._prepare(frame, self.mode)
+        with stage("encode"):
+            self._stream.fp.write(np.ascontiguousarray(arr).data)
+        self.frame_count += 1
+
+    def close(self):
+        self._stream.close()
+
+class Y4MWriter(_Sink):
+    """
+    Streams frames as YUV4MPEG2 (4:4:4, full range), which ffmpeg, x264 and
+    most video tools read directly and which carries its own size and rate.
+    The frame rate comes from the frame duration in milliseconds.
+    """
+
+    def __init__(self, path, duration=100, scale=1):
+        self.rate = Fraction(1000, duration)
+        self.scale = scale
+        self.size = None
+        self.frame_count = 0
+        self._stream = _Stream(path)
+
+    def write(self, frame, duration=None, key=None):
+        if self.size is None:
+            w, h = frame.size
+            header = (f"YUV4MPEG2 W{w * self.scale} H{h * self.scale} "
+                      f"F{self.rate.numerator}:{self.rate.denominator} Ip A1:1 C444 XCOLORRANGE=FULL\n")
+            self._stream.fp.write(header.encode())
+        arr = self._prepare(frame, 'YCbCr')
+        with stage("encode"):
+            # Planar: all Y, then all Cb, then all Cr
+            self._stream.fp.write(b"FRAME\n")
+            self._stream.fp.write(np.ascontiguousarray(arr.transpose(2, 0, 1)).data)
+        self.frame_count += 1
+
+    def close(self):
+        self._stream.close()
+
+def _save_png(img, path, compress_level, frame):
+    with stage("encode", frame=frame):
+        img.save(path, compress_level=compress_level)
+
+class PngSequenceWriter(_Sink):
+    """
+    Writes numbered PNGs (frame_00000.png, ...) into a directory. Compression
+    runs on a thread pool (zlib releases the GIL); only a few frames per thread
+    are queued at once, so memory stays bounded.
+    """
+
+    def __init__(self, directory, scale=1, workers=None, compress_level=6, pattern="frame_{:05d}.png"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.scale = scale
+        self.size = None
+        self.frame_count = 0
+        self.compress_level = compress_level
+        self.pattern = pattern
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending = deque()
+
+    def write(self, frame, duration=None, key=None):
+        img = Image.fromarray(self._prepare(frame, 'RGBA' if frame.mode in ('RGBA', 'LA', 'P') else 'RGB'))
+        path = os.path.join(self.directory, self.pattern.format(self.frame_count))
+        self._pending.append(self._pool.submit(_save_png, img, path, self.compress_level, self.frame_count))
+        if len(self._pending) > self.workers * 2:
+            self._pending.popleft().result()
+        self.frame_count += 1
+
+    def close(self):
+        while self._pending:
+            self._pending.popleft().result()
+        self._pool.shutdown()
+
+def sink_path(output_dir, stem, output_format):
+    """Default output for a format: <stem>.<ext> (a <stem>/ directory for PNG sequences)."""
+    return os.path.join(output_dir, stem + EXTENSIONS[output_format])
+
+def open_sink(output_format, path, duration=100, scale=1, **gif_options):
+    """Opens a frame writer for one of FORMATS; gif_options go to GifWriter."""
+    if output_format == "gif":
+        return GifWriter(path, duration=duration, scale=scale, **gif_options)
+    if output_format == "png":
+        return PngSequenceWriter(path, scale=scale)
+    if output_format in ("raw", "rgba"):
+        return RawWriter(path, 'RGB' if output_format == "raw" else 'RGBA', scale=scale)
+    if output_format == "y4m":
+        return Y4MWriter(path, duration=duration, scale=scale)
+    raise ValueError(f"Unknown output format '{output_format}', choose from: {', '.join(FORMATS)}")
@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import numpy as np
+
+# --- On-Disk Frame Store With Checkpoints ---
+# Long stateful renders write each finished frame into a raw file through
+# np.memmap, so frames live on disk instead of in RAM, and every few frames save
+# the simulation state next to it. After a crash the same render picks up at
+# the last checkpoint; frames past it are simply rendered again. Layout of a
+# store directory:
+#   store.json      frame shape, dtype and the render's parameters
+#   frames.bin      frames back to back, (count, *shape)
+#   checkpoint.npz  simulation state and the number of frames it belongs to
+CHECKPOINT_EVERY = 50  # Frames between checkpoints
+GROW_FRAMES = 64       # The frame file grows by this many frames at a time
+
+def _save_atomic(path, write):
+    # Written next to the target and renamed over it, so a crash never leaves half a file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            write(fp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+class FrameStore:
+    """
+    Appends frames of one shape to a memory-mapped file in `directory` and keeps
+    the latest checkpoint. Opening an existing store continues it: len(store) is
+    the number of frames covered by its checkpoint, and resume() returns that
+    checkpoint's state. params (JSON-serializable) describe the render; reopening
+    with different params or a different shape raises ValueError.
+
+        store = FrameStore("render.store", (270, 480, 3), params)
+        state = store.resume()          # None for a fresh store
+        for f in range(len(store), frames):
+            store.append(render(f))
+            if (f + 1) % CHECKPOINT_EVERY == 0:
+                store.checkpoint(**state_now)
+        for frame in store.frames(): ...
+    """
+
+    def __init__(self, directory, shape, params=None, dtype=np.uint8):
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.params = params or {}
+        os.makedirs(directory, exist_ok=True)
+        meta = {"shape": list(self.shape), "dtype": self.dtype.str, "params": self.params}
+        meta_path = os.path.join(directory, "store.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as fp:
+                stored = json.load(fp)
+            if stored != json.loads(json.dumps(meta)):
+                raise ValueError(f"Frame store {directory} belongs to a different render "
+                                 f"({stored}); delete it or pick another directory")
+        else:
+            _save_atomic(meta_path, lambda fp: fp.write(json.dumps(meta).encode()))
+
+        self._path = os.path.join(directory, "frames.bin")
+        self._checkpoint_path = os.path.join(directory, "checkpoint.npz")
+        self._state = None
+        self.count = 0
+        if os.path.exists(self._checkpoint_path):
+            with np.load(self._checkpoint_path) as data:
+                self._state = {k: data[k] for k in data.files}
+            self.count = int(self._state.pop("frame_count"))
+        with open(self._path, "ab"):
+            pass  # Create the frame file if needed
+        self._map = None
+        self._map_frames(max(self.count, os.path.getsize(self._path) // self.frame_bytes))
+
+    @property
+    def frame_bytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def _map_frames(self, capacity):
+        if self._map is not None:
+            self._map.flush()
+        self.capacity = capacity
+        if os.path.getsize(self._path) < capacity * self.frame_bytes:
+            os.truncate(self._path, capacity * self.frame_bytes)
+        # A zero-length file cannot be mapped; the first append() grows it
+        self._map = np.memmap(self._path, self.dtype, "r+", shape=(capacity,) + self.shape) if capacity else None
+
+    def __len__(self):
+        return self.count
+
+    def resume(self):
+        """State saved by the last checkpoint() ({name: array}), or None for a fresh store."""
+        return self._state
+
+    def append(self, frame):
+        """Writes the next frame (anything that converts to an array of the store's shape)."""
+        if self.count == self.capacity:
+            self._map_frames(self.capacity + GROW_FRAMES)
+        self._map[self.count] = frame
+        self.count += 1
+
+    def checkpoint(self, **state):
+        """Flushes the frames so far and saves state (arrays) as the point to resume from."""
+        if self._map is not None:
+            self._map.flush()
+        _save_atomic(self._checkpoint_path, lambda fp: np.savez(fp, frame_count=self.count, **state))
+        self._state = state
+
+    def frames(self, start=0, stop=None):
+        """Yields stored frames as read-only views into the memory map (nothing is loaded up front)."""
+        stop = self.count if stop is None else min(stop, self.count)
+        for i in range(start, stop):
+            frame = self._map[i]
+            frame.flags.writeable = False
+            yield frame
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        # Drop the unused tail the file grew by
+        os.truncate(self._path, self.count * self.frame_bytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,545 @@
+import hashlib
+import shutil
+import struct
+import sys
+import tempfile
+from collections import OrderedDict
+import numpy as np
+from PIL import Image, ImageColor
+
+from instrument import stage
+from output_formats import STDOUT
+
+# Config
+MAX_COLORS = 255   # Shared palette size; one slot stays free for "unchanged" pixels
+REUSE_CACHE = 32   # Recently seen frames kept (planned and encoded) for reuse by content hash
+SNAP_CHUNK = 16384 # Distinct colors matched against the palette at once in snap_to_palette
+
+# --- Duplicate Frames ---
+def frame_key(frame):
+    """Content hash of a frame (pixels, mode, size and palette)."""
+    h = hashlib.blake2b(frame.tobytes(), digest_size=16)
+    h.update(f"{frame.mode}{frame.size}".encode())
+    if frame.mode == 'P':
+        h.update(bytes(frame.getpalette() or ()))
+    return h.digest()
+
+def collapse_duplicates(frames, duration):
+    """
+    Yields (frame, duration, key) for a stream of frames, merging each run of
+    identical consecutive frames into its first frame with the summed duration,
+    so playback is unchanged. Holds back one frame to see where a run ends.
+    """
+    pending = None
+    for frame in frames:
+        key = frame_key(frame)
+        if pending is not None and pending[2] == key:
+            pending[1] += duration
+            continue
+        if pending is not None:
+            yield tuple(pending)
+        pending = [frame, duration, key]
+    if pending is not None:
+        yield tuple(pending)
+
+def _cached(cache, key, make):
+    # Small LRU over an OrderedDict; key None means "do not cache"
+    if key is None:
+        return make()
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    value = cache[key] = make()
+    if len(cache) > REUSE_CACHE:
+        cache.popitem(last=False)
+    return value
+
+# --- Shared Palette ---
+class SharedPalette:
+    """
+    One global palette for a whole animation. Seeded with the scene's known colors
+    and grown with any new exact color a frame brings, up to MAX_COLORS entries.
+    Indices never change once assigned, so earlier frames stay valid while the
+    palette grows. A frame whose new colors do not fit is refused as a whole
+    (index() returns None) rather than remapped to nearby colors; the writer then
+    stores it with a palette of its own.
+    """
+
+    def __init__(self, colors=()):
+        self.colors = []
+        self._index = {}
+        for color in colors:
+            if isinstance(color, str):
+                color = ImageColor.getrgb(color)
+            self._add(int(_pack(np.array(color[:3], dtype=np.uint32))))
+
+    def _add(self, key):
+        if key not in self._index:
+            self._index[key] = len(self.colors)
+            self.colors.append(((key >> 16) & 255, (key >> 8) & 255, key & 255))
+        return self._index[key]
+
+    def index_packed(self, packed):
+        """Maps packed RGB (see _pack) to uint8 palette indices, or None if the colors do not fit."""
+        keys, inverse = np.unique(packed, return_inverse=True)
+        new = [int(k) for k in keys if int(k) not in self._index]
+        if len(self.colors) + len(new) > MAX_COLORS:
+            return None
+        lut = np.array([self._add(int(k)) for k in keys], dtype=np.uint8)
+        return lut[inverse].reshape(packed.shape)
+
+    def index(self, frame):
+        """Maps an RGB frame to an (H, W) uint8 array of palette indices, or None if its colors do not fit."""
+        return self.index_packed(_pack_frame(frame))
+
+def _pack(rgb):
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+def _pack_frame(frame):
+    return _pack(np.asarray(frame.convert('RGB') if frame.mode != 'RGB' else frame).astype(np.uint32))
+
+def _table_bits(entries):
+    # Smallest GIF color table (2 ** bits entries, at least 2) holding `entries`
+    return max(1, (max(entries, 1) - 1).bit_length())
+
+def _color_table(colors, bits):
+    table = bytearray(3 << bits)
+    table[:len(colors)] = colors
+    return bytes(table)
+
+# --- Clip Palettes ---
+# Scenes with soft light (blur, glow) have more colors than a GIF palette holds.
+# Mapping every frame onto one palette built from the whole clip keeps them on
+# the shared palette and its small delta frames, instead of a palette per frame.
+def clip_palette(frames, colors=(), size=MAX_COLORS):
+    """
+    One palette for a clip as an (N, 3) uint8 array: the exact `colors` (flat
+    scene colors that must survive unchanged) plus the distinct colors of the
+    sample `frames`, reduced by max coverage, at most `size` entries in all.
+    Every distinct color counts once, so faint gradients are not crowded out
+    by the large flat areas.
+    """
+    fixed = [ImageColor.getrgb(c) if isinstance(c, str) else tuple(c[:3]) for c in colors]
+    keys = np.unique(np.concatenate([_pack_frame(f).ravel() for f in frames]))
+    strip = np.stack([keys >> 16, (keys >> 8) & 255, keys & 255], axis=1).astype(np.uint8)
+    reduced = Image.fromarray(strip[None]).quantize(size - len(fixed), method=Image.Quantize.MAXCOVERAGE)
+    used = np.unique(np.asarray(reduced))
+    cover = np.array(reduced.getpalette()[:3 * (int(used.max()) + 1)], dtype=np.uint8).reshape(-1, 3)[used]
+    palette = np.concatenate([np.array(fixed, dtype=np.uint8).reshape(-1, 3), cover])
+    _, first = np.unique(_pack(palette.astype(np.uint32)), return_index=True)
+    return palette[np.sort(first)]
+
+def _nearest(keys, palette):
+    # Index of the nearest palette color for each packed RGB key
+    rgb = np.stack([keys >> 16, (keys >> 8) & 255, keys & 255], axis=1).astype(np.float32)
+    pal = palette.astype(np.float32)
+    # |c - p|^2 = |c|^2 - 2 c.p + |p|^2, and |c|^2 is the same for every p. All
+    # terms are integers below 2 ** 24, so float32 ranks them exactly.
+    bias = (pal ** 2).sum(axis=1)
+    nearest = np.empty(len(keys), dtype=np.intp)
+    for i in range(0, len(keys), SNAP_CHUNK):
+        nearest[i:i + SNAP_CHUNK] = (bias - 2 * rgb[i:i + SNAP_CHUNK] @ pal.T).argmin(axis=1)
+    return nearest
+
+def snap_to_palette(frame, palette):
+    """The frame as RGB with every pixel replaced by its nearest color in palette (see clip_palette)."""
+    packed = _pack_frame(frame)
+    keys, inverse = np.unique(packed, return_inverse=True)
+    return Image.fromarray(palette[_nearest(keys, palette)][inverse.reshape(packed.shape)])
+
+class PaletteSnap:
+    """
+    snap_to_palette for a stream of frames onto one palette. The nearest entry
+    of every color is remembered in a table over all 2 ** 24 colors (16 MB), so
+    a color is only matched the first time it shows up.
+    """
+
+    def __init__(self, palette):
+        self.palette = palette
+        self._table = np.full(1 << 24, MAX_COLORS, dtype=np.uint8)  # MAX_COLORS: not matched yet
+
+    def __call__(self, frame):
+        packed = _pack_frame(frame)
+        idx = self._table[packed]
+        new = idx == MAX_COLORS
+        if new.any():
+            keys = np.unique(packed[new])
+            self._table[keys] = _nearest(keys, self.palette)
+            idx = self._table[packed]
+        return Image.fromarray(self.palette[idx])
+
+# --- Delta Frames ---
+class Delta:
+    """
+    One frame as stored in the GIF: palette indices for the rectangle at (x0, y0)
+    that changed, the rectangle's own color table as RGB bytes (None means the
+    global one) and the index standing for "unchanged, show the previous frame"
+    (None if unused).
+    """
+
+    def __init__(self, x0, y0, indices, palette=None, transparency=None):
+        self.x0, self.y0 = int(x0), int(y0)
+        self.indices = indices
+        self.palette = palette
+        self.transparency = transparency
+
+def _bbox(ys, xs):
+    return xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+
+def _changed(current, previous, boxes=None):
+    # Coordinates of the pixels that differ, looking only inside boxes if given
+    if boxes is None:
+        return np.nonzero(current != previous)
+    ys, xs = [], []
+    for x0, y0, x1, y1 in boxes:
+        by, bx = np.nonzero(current[y0:y1, x0:x1] != previous[y0:y1, x0:x1])
+        ys.append(by + y0)
+        xs.append(bx + x0)
+    return np.concatenate(ys or [[]]).astype(np.intp), np.concatenate(xs or [[]]).astype(np.intp)
+
+class DeltaPlanner:
+    """
+    Turns a stream of full frames into Deltas against the frame before, once per
+    frame however many outputs share it. Frames are compared as packed RGB and
+    only the bounding box of changed pixels is stored, with unchanged pixels
+    inside it left transparent. With a SharedPalette that box maps onto the
+    global palette; without one, or when its colors overflow the palette, the
+    box gets a palette of its own (exact up to 255 colors, octree-quantized past
+    that, plus a transparent slot).
+
+    Frames from a scene_graph.SceneGraph carry info["changed"] = (base_id, boxes).
+    When base_id is the id of the frame planned just before, only those boxes are
+    read and compared; everything else is known to be unchanged.
+    """
+
+    def __init__(self, palette=None):
+        self.palette = palette
+        self.global_entries = 0    # Global table entries referenced so far (colors and transparency)
+        self.local_frames = 0      # Frames stored with their own palette
+        self._previous = None      # Packed RGB of the last planned frame
+        self._previous_key = None
+        self._previous_id = None   # info["frame_id"] of the last planned frame
+        self._planned = OrderedDict()  # (previous key, key) -> Delta
+
+    def plan(self, frame, key=None):
+        """
+        The Delta for the next frame and a cache key for its encoding (None if the
+        frame has no content key). `key` is the frame's content hash (see frame_key).
+        """
+        info = getattr(frame, "info", {})
+        base_id, boxes = info.get("changed", (None, None))
+        previous_id, self._previous_id = self._previous_id, info.get("frame_id")
+        if base_id is None or base_id != previous_id or self._previous is None:
+            boxes = None
+        with stage("delta"):
+            current = self._read(frame, boxes)
+        # A delta frame only depends on this frame and the one before it
+        previous = b"" if self._previous is None else self._previous_key
+        cache_key = None if key is None or previous is None else (previous, key)
+        with stage("quantize"):
+            delta = _cached(self._planned, cache_key, lambda: self._delta(frame, current, boxes))
+        if delta.palette is None:
+            self.global_entries = max(self.global_entries, len(self.palette.colors),
+                                      (delta.transparency or 0) + 1)
+        self._previous = current
+        self._previous_key = key
+        return delta, cache_key
+
+    def _read(self, frame, boxes=None):
+        # Packed RGB; with boxes, only those regions are read and the rest is
+        # taken over from the previous frame
+        if boxes is None:
+            return _pack_frame(frame)
+        current = self._previous.copy()
+        for x0, y0, x1, y1 in boxes:
+            current[y0:y1, x0:x1] = _pack_frame(frame.crop((x0, y0, x1, y1)))
+        return current
+
+    def _delta(self, frame, current, boxes):
+        if self._previous is None:
+            return self._store(frame, current, 0, 0, None)
+        ys, xs = _changed(current, self._previous, boxes)
+        if len(xs) == 0:
+            # Nothing moved: a single transparent pixel just holds the frame
+            return Delta(0, 0, np.zeros((1, 1), dtype=np.uint8), bytes(6), transparency=0)
+        x0, y0, x1, y1 = _bbox(ys, xs)
+        changed = current[y0:y1, x0:x1] != self._previous[y0:y1, x0:x1]
+        return self._store(frame.crop((x0, y0, x1, y1)), current[y0:y1, x0:x1], x0, y0, changed)
+
+    def _store(self, region, packed, x0, y0, changed):
+        idx = None if self.palette is None else self.palette.index_packed(packed)
+        if idx is not None:
+            # Unchanged pixels take the first global index no color has yet
+            n = len(self.palette.colors)
+            if changed is None or n >= 256:
+                return Delta(x0, y0, idx) if changed is None else self._quantized(region, packed, x0, y0, changed)
+            return Delta(x0, y0, np.where(changed, idx, n).astype(np.uint8), transparency=n)
+        return self._quantized(region, packed, x0, y0, changed)
+
+    def _quantized(self, region, packed, x0, y0, changed):
+        # The rectangle with its own palette: exact when its changed pixels have
+        # up to 255 colors, a fast octree quantization past that (adaptive median
+        # cut was ~20x slower on glowing frames). Unchanged pixels get the first
+        # index past its colors.
+        self.local_frames += 1
+        keys, inverse = np.unique(packed if changed is None else packed[changed], return_inverse=True)
+        if len(keys) <= MAX_COLORS:
+            n = len(keys)
+            palette = np.stack([keys >> 16, (keys >> 8) & 255, keys & 255], axis=1).astype(np.uint8).tobytes()
+            if changed is None:
+                return Delta(x0, y0, inverse.reshape(packed.shape).astype(np.uint8), palette)
+            idx = np.full(packed.shape, n, dtype=np.uint8)
+            idx[changed] = inverse.ravel()
+            return Delta(x0, y0, idx, palette + bytes(3), transparency=n)
+        region = region.convert('RGB').quantize(MAX_COLORS, method=Image.Quantize.FASTOCTREE)
+        idx = np.asarray(region)
+        n = int(idx.max()) + 1
+        palette = bytes(region.getpalette()[:n * 3])
+        if changed is None:
+            return Delta(x0, y0, idx, palette)
+        return Delta(x0, y0, np.where(changed, idx, n).astype(np.uint8), palette + bytes(3), transparency=n)
+
+# --- Frame Encoding ---
+def _lzw(indices, bits):
+    # LZW image data (minimum code size byte, sub-blocks, terminator) through Pillow's
+    # GIF encoder. That is private API, so fall back to _lzw_python if it goes away.
+    img = Image.frombytes('P', (indices.shape[1], indices.shape[0]), np.ascontiguousarray(indices).tobytes())
+    try:
+        encoder = Image._getencoder('P', 'gif', ('P', bits, 0))
+        encoder.setimage(img.im, (0, 0) + img.size)
+    except (AttributeError, TypeError, OSError):
+        return _lzw_python(indices, bits)
+    chunks = [bytes([bits])]
+    status = 0
+    while not status:
+        _, status, data = encoder.encode(65536)
+        chunks.append(data)
+    if status < 0:
+        raise OSError(f"GIF encoder error {status}")
+    chunks.append(b"\x00")
+    return b"".join(chunks)
+
+def _lzw_python(indices, bits):
+    # Same output format as _lzw in plain Python: variable width codes from bits + 1
+    # up to 12, a clear code when the table fills, packed LSB first into sub-blocks
+    clear, end = 1 << bits, (1 << bits) + 1
+    out = bytearray()
+    acc = n_acc = 0
+    width, next_code, table = bits + 1, end + 1, {}
+
+    def emit(code):
+        nonlocal acc, n_acc
+        acc |= code << n_acc
+        n_acc += width
+        while n_acc >= 8:
+            out.append(acc & 255)
+            acc >>= 8
+            n_acc -= 8
+
+    emit(clear)
+    pixels = np.ascontiguousarray(indices, dtype=np.uint8).tobytes()
+    prefix = pixels[0]
+    for px in pixels[1:]:
+        code = table.get(prefix << 8 | px)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix)
+        if next_code < 4096:
+            table[prefix << 8 | px] = next_code
+            next_code += 1
+            if next_code > 1 << width and width < 12:
+                width += 1
+        else:
+            emit(clear)
+            width, next_code, table = bits + 1, end + 1, {}
+        prefix = px
+    emit(prefix)
+    emit(end)
+    if n_acc:
+        out.append(acc & 255)
+    blocks = [bytes([bits])]
+    for i in range(0, len(out), 255):
+        blocks.append(bytes([len(out[i:i + 255])]) + out[i:i + 255])
+    blocks.append(b"\x00")
+    return b"".join(blocks)
+
+def encode_delta(delta, duration, first=False, scale=1):
+    """
+    GIF blocks for one Delta (graphic control extension, image descriptor, local
+    color table if any and LZW data), upscaled by an integer scale. The LZW code
+    size follows the highest index the frame uses, not a fixed 8 bits.
+    """
+    sub = delta.indices
+    if scale > 1:
+        with stage("scale"):
+            sub = np.repeat(np.repeat(sub, scale, axis=1), scale, axis=0)
+    with stage("encode"):
+        transparent = not first and delta.transparency is not None
+        # Disposal 1 keeps each frame under the next one
+        packed = (0 if first else 1 << 2) | (1 if transparent else 0)
+        blocks = [b"!\xf9\x04" + struct.pack("<BHBB", packed, int(duration / 10),
+                                                delta.transparency if transparent else 0, 0)]
+        h, w = sub.shape
+        flags = 0
+        table = b""
+        if delta.palette is not None:
+            table_bits = _table_bits(len(delta.palette) // 3)
+            flags = 0x80 | (table_bits - 1)
+            table = _color_table(delta.palette, table_bits)
+        blocks.append(b"," + struct.pack("<HHHHB", delta.x0 * scale, delta.y0 * scale, w, h, flags) + table)
+        blocks.append(_lzw(sub, max(2, int(sub.max()).bit_length())))
+        return b"".join(blocks)
+
+# --- Streaming GIF Writer ---
+class GifWriter:
+    """
+    Writes an animated GIF one frame at a time. Each frame is encoded as soon as
+    it arrives and spooled to a temporary file, so memory stays constant no
+    matter how long the animation is; close() writes the header, sized to the
+    colors actually used, and copies the frames after it. Frames are passed at
+    native resolution; `scale` expands them by an integer factor inside the
+    encode step.
+
+    Each frame after the first only stores the bounding box of pixels that
+    changed, with unchanged pixels inside it left transparent over the previous
+    frame (see DeltaPlanner). By default every stored rectangle gets its own
+    palette. With optimize=True the GIF uses one global palette instead (a
+    SharedPalette, seeded with `colors`), and only frames whose colors overflow
+    it carry a palette of their own.
+
+        with GifWriter("out.gif", duration=100) as gif:
+            for img in frames:
+                gif.write(img)
+    """
+
+    def __init__(self, path, duration=100, loop=0, scale=1, optimize=False, colors=(), planner=None):
+        self.path = path
+        self.duration = duration
+        self.loop = loop
+        self.scale = scale
+        self.planner = planner or DeltaPlanner(SharedPalette(colors) if optimize else None)
+        self.size = None
+        self.frame_count = 0
+        self._encoded = OrderedDict()  # (previous key, key, duration) -> GIF blocks
+        # "-" streams to the process's real stdout, like the raw sinks in frame_sinks
+        self._fp = sys.__stdout__.buffer if path == STDOUT else open(path, 'wb')
+        self._spool = tempfile.TemporaryFile()
+
+    @property
+    def palette(self):
+        return self.planner.palette
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _header(self):
+        w, h = self.size
+        entries = self.planner.global_entries
+        if not entries:
+            # Logical screen without a global color table; every frame carries its own
+            header = b"GIF89a" + struct.pack("<HHBBB", w, h, 0, 0, 0)
+        else:
+            bits = _table_bits(entries)
+            colors = b"".join(bytes(c) for c in self.palette.colors)
+            header = b"GIF89a" + struct.pack("<HHBBB", w, h, 0xF0 | (bits - 1), 0, 0) + _color_table(colors, bits)
+        if self.loop is not None:
+            # NETSCAPE2.0 application extension (loop count, 0 = forever)
+            header += b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", self.loop) + b"\x00"
+        return header
+
+    def write(self, frame, duration=None, key=None):
+        """
+        Appends one native-resolution frame. `key` is the frame's content hash
+        (see frame_key); frames seen recently under the same key, after the same
+        frame as before, reuse their planned and encoded data.
+        """
+        self._check_size(*frame.size)
+        delta, cache_key = self.planner.plan(frame, key)
+        self.write_delta(delta, duration, cache_key)
+
+    def _check_size(self, w, h):
+        size = (w * self.scale, h * self.scale)
+        if self.size is None:
+            self.size = size
+        elif size != self.size:
+            raise ValueError(f"Frame size {size} does not match GIF size {self.size}")
+
+    def write_delta(self, delta, duration=None, cache_key=None):
+        """Appends a planned Delta (see DeltaPlanner.plan)."""
+        duration = self.duration if duration is None else duration
+        first = self.frame_count == 0
+        key = None if cache_key is None else (cache_key, duration, first)
+        data = _cached(self._encoded, key, lambda: encode_delta(delta, duration, first, self.scale))
+        self._spool.write(data)
+        self.frame_count += 1
+
+    def close(self):
+        if self._spool.closed:
+            return
+        if self.size is not None:
+            self._fp.write(self._header())
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, self._fp)
+            self._fp.write(b";")  # Trailer
+        self._spool.close()
+        if self.path == STDOUT:
+            self._fp.flush()
+        else:
+            self._fp.close()
+
+class MultiScaleGifWriter:
+    """
+    Emits one native render as several GIFs at different integer scales.
+    Every frame is planned (quantized or palette-mapped) once and shared by all outputs.
+    """
+
+    def __init__(self, paths, duration=100, loop=0, optimize=False, colors=()):
+        # paths maps scale -> output path
+        self.planner = DeltaPlanner(SharedPalette(colors) if optimize else None)
+        self.writers = [GifWriter(path, duration, loop, scale, planner=self.planner)
+                        for scale, path in paths.items()]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, frame, duration=None, key=None):
+        for writer in self.writers:
+            writer._check_size(*frame.size)
+        delta, cache_key = self.planner.plan(frame, key)
+        for writer in self.writers:
+            writer.write_delta(delta, duration, cache_key)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+def write_gif(path, frames, duration=100, loop=0, scale=1, optimize=False, colors=(), dedupe=True):
+    """
+    Streams an iterable of native frames (a list or a generator) into a GIF.
+    With dedupe, repeated consecutive frames become one longer frame and
+    recurring frames reuse their earlier encoding.
+    """
+    with GifWriter(path, duration=duration, loop=loop, scale=scale, optimize=optimize, colors=colors) as gif:
+        _write_frames(gif, frames, duration, dedupe)
+    return path
+
+def write_gif_scales(paths, frames, duration=100, loop=0, optimize=False, colors=(), dedupe=True):
+    """Streams one render into a GIF per scale. paths maps scale -> output path."""
+    with MultiScaleGifWriter(paths, duration=duration, loop=loop, optimize=optimize, colors=colors) as gif:
+        _write_frames(gif, frames, duration, dedupe)
+    return list(paths.values())
+
+def _write_frames(gif, frames, duration, dedupe):
+    if not dedupe:
+        for frame in frames:
+            gif.write(frame)
+        return
+    for frame, frame_duration, key in collapse_duplicates(frames, duration):
+        gif.write(frame, frame_duration, key)
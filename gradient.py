@@ -0,0 +1,43 @@
+import numpy as np
+from functools import lru_cache
+
+# --- Color Ramps ---
+@lru_cache(maxsize=64)
+def _stops(stops):
+    arr = np.asarray(stops, dtype=np.float64)
+    arr.setflags(write=False)
+    return arr
+
+def ramp_colors(stops, pos):
+    """
+    Colors at ramp positions pos (any shape, 0..1) through the color stops, as uint8
+    (..., 3). Evaluated exactly at each position and truncated like lerp_color's
+    int(), so every row matches the old per-row loop.
+    """
+    stops = _stops(tuple(tuple(int(c) for c in s) for s in stops))
+    if len(stops) == 1:
+        return np.broadcast_to(stops[0].astype(np.uint8), np.shape(pos) + (3,))
+    pos = np.asarray(pos) * (len(stops) - 1)
+    idx = np.minimum(pos.astype(np.intp), len(stops) - 2)
+    t = (pos - idx)[..., None]
+    return (stops[idx] + (stops[idx + 1] - stops[idx]) * t).astype(np.uint8)
+
+# --- Gradients ---
+def ramp_positions(height, t_offsets=0.0, haze=0.05, freq=5):
+    """Per-row ramp positions (frames, height) in 0..1 with the sine "heat haze" shift."""
+    y = np.arange(height) / height
+    t = np.atleast_1d(np.asarray(t_offsets, dtype=np.float64))
+    pos = y[None, :]
+    if haze:
+        pos = pos + np.sin(pos * freq + t[:, None]) * haze
+    return np.clip(np.broadcast_to(pos, (len(t), height)), 0, 1)
+
+def vertical_gradient(width, height, stops, t_offsets=0.0, haze=0.05, freq=5):
+    """
+    Evaluates a (frames, height, width, 3) vertical gradient, one frame per t offset.
+    Rows are looked up once and broadcast across the width, so the result is a
+    read-only view; copy a frame before drawing on it.
+    """
+    # Only frames x height colors are computed; the width is a broadcast
+    rows = ramp_colors(stops, ramp_positions(height, t_offsets, haze, freq))  # (frames, height, 3)
+    return np.broadcast_to(rows[:, :, None, :], (rows.shape[0], height, width, 3))
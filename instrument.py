@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# --- Opt-in Stage Timing ---
+# Off unless RENDER_TRACE is set (or enable() is called). When off, stage() hands
+# back one shared no-op context manager, so instrumented loops pay a single call.
+ENABLED = os.environ.get("RENDER_TRACE", "") not in ("", "0")
+
+_events = []  # (stage, frame, start_ns, duration_ns, pid, tid, label)
+_frame = None
+_label = None
+_NULL = nullcontext()
+
+class _Stage:
+    __slots__ = ("name", "frame", "label", "start")
+
+    def __init__(self, name, frame, label):
+        self.name = name
+        self.frame = frame
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _events.append((self.name, self.frame, self.start, time.perf_counter_ns() - self.start,
+                        os.getpid(), threading.get_ident(), self.label))
+
+def enable():
+    """Turns timing on, here and in worker processes started from now on."""
+    global ENABLED
+    ENABLED = True
+    os.environ["RENDER_TRACE"] = "1"
+
+def disable():
+    global ENABLED
+    ENABLED = False
+    os.environ.pop("RENDER_TRACE", None)
+
+def set_label(name):
+    """Names the render (e.g. the generator) that following stages belong to."""
+    global _label
+    _label = name
+
+def set_frame(idx):
+    """Marks the frame that following stages belong to."""
+    global _frame
+    _frame = idx
+
+def stage(name, frame=None):
+    """Context manager timing one stage of the current (or given) frame."""
+    if not ENABLED:
+        return _NULL
+    return _Stage(name, _frame if frame is None else frame, _label)
+
+# --- Collection ---
+def drain():
+    """Returns and clears the recorded events (used to ship them back from workers)."""
+    events = list(_events)
+    _events.clear()
+    return events
+
+def merge(events):
+    """Adds events recorded in another process, under this process's label."""
+    _events.extend(e if e[6] is not None else e[:6] + (_label,) for e in events)
+
+def reset():
+    _events.clear()
+    set_frame(None)
+    set_label(None)
+
+# --- Reports ---
+def summary():
+    """
+    Timings in milliseconds per label: aggregate stats per stage and the
+    per-frame breakdown. {label: {"stages": {...}, "frames": {frame: {stage: ms}}}}
+    """
+    report = {}
+    for name, frame, _, dur, _, _, label in _events:
+        ms = dur / 1e6
+        entry = report.setdefault(label or "render", {"stages": {}, "frames": {}})
+        s = entry["stages"].setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["count"] += 1
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+        if frame is not None:
+            per_frame = entry["frames"].setdefault(str(frame), {})
+            per_frame[name] = per_frame.get(name, 0.0) + ms
+    for entry in report.values():
+        for s in entry["stages"].values():
+            s["mean_ms"] = s["total_ms"] / s["count"]
+    return report
+
+def write_json(path):
+    with open(path, "w") as f:
+        json.dump(summary(), f, indent=2)
+    return path
+
+def write_chrome_trace(path):
+    """Writes the events as a Chrome trace (open in chrome://tracing or Perfetto)."""
+    events = [
+        {"name": name, "cat": label or "render", "ph": "X", "ts": start / 1000, "dur": dur / 1000,
+         "pid": pid, "tid": tid, "args": {} if frame is None else {"frame": frame}}
+        for name, frame, start, dur, pid, tid, label in _events
+    ]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
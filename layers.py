@@ -0,0 +1,91 @@
+import math
+import numpy as np
+from PIL import ImageDraw
+from functools import lru_cache
+
+from frame_pool import blend, borrowed, buffer, image_view
+
+# --- Static Layers ---
+class Layer:
+    """
+    A pre-rasterized RGBA layer, cropped to its visible pixels.
+    Keeps the color, coverage and opaque mask ready so compositing is a single blit.
+    """
+
+    def __init__(self, rgba):
+        alpha = rgba[..., 3]
+        ys, xs = np.nonzero(alpha)
+        if len(xs) == 0:
+            self.x0 = self.y0 = 0
+            rgba = rgba[:0, :0]
+        else:
+            self.x0, self.y0 = int(xs.min()), int(ys.min())
+            rgba = rgba[self.y0:ys.max() + 1, self.x0:xs.max() + 1]
+        self.rgb = np.array(rgba[..., :3])
+        self.alpha = np.array(rgba[..., 3])
+        self.mask = self.alpha == 255
+        # Pixel art layers are all-or-nothing, which lets composite skip the blend math
+        self.opaque = bool(np.all(self.mask | (self.alpha == 0)))
+        for arr in (self.rgb, self.alpha, self.mask):
+            arr.setflags(write=False)
+
+    @property
+    def size(self):
+        return self.rgb.shape[1], self.rgb.shape[0]
+
+@lru_cache(maxsize=512)
+def _rasterize(draw_fn, size, params):
+    # Drawn straight into a pooled buffer; Layer copies out the visible crop
+    with borrowed((size[1], size[0], 4), fill=0) as rgba:
+        draw_fn(ImageDraw.Draw(image_view(rgba)), *params)
+        return Layer(rgba)
+
+def static_layer(draw_fn, size, *params):
+    """
+    Rasterizes draw_fn(draw, *params) onto a transparent RGBA canvas of the given size.
+    The result is cached by (draw_fn, size, params), so unchanging scene elements
+    are only ever drawn once. params must be hashable.
+    """
+    return _rasterize(draw_fn, tuple(size), params)
+
+# --- Compositor ---
+def composite(dst, layer, x=0, y=0):
+    """Blits a layer onto an (H, W, 3) uint8 array in place, offset by (x, y) and clipped to dst."""
+    h, w = dst.shape[:2]
+    lw, lh = layer.size
+    left, top = x + layer.x0, y + layer.y0
+    # Clip the layer rectangle against the destination
+    sx0, sy0 = max(0, -left), max(0, -top)
+    sx1, sy1 = min(lw, w - left), min(lh, h - top)
+    if sx0 >= sx1 or sy0 >= sy1:
+        return dst
+
+    region = dst[top + sy0:top + sy1, left + sx0:left + sx1]
+    rgb = layer.rgb[sy0:sy1, sx0:sx1]
+    if layer.opaque:
+        mask = layer.mask[sy0:sy1, sx0:sx1]
+        region[mask] = rgb[mask]
+    else:
+        blend(region, rgb, layer.alpha[sy0:sy1, sx0:sx1])
+    return dst
+
+# --- Sprite Parts ---
+def place_sprite(dst, draw_fn, x, y, *params):
+    """
+    Composites the part that draw_fn(draw, x, y, *params) draws around (x, y).
+    The part is rasterized once per variant (its params and the fractional part
+    of x, y) and blitted at the integer offset, so moving a part never redraws it.
+    Parts must fit on a canvas the size of dst around their anchor.
+    """
+    h, w = dst.shape[:2]
+    ix, iy = math.floor(x), math.floor(y)
+    # Drawn around the middle of a double-size canvas so parts can reach in any direction
+    layer = static_layer(draw_fn, (w * 2, h * 2), w + (x - ix), h + (y - iy), *params)
+    return composite(dst, layer, ix - w, iy - h)
+
+def blank_canvas(size, color):
+    """
+    An (H, W, 3) uint8 canvas filled with one color. It is a pooled buffer
+    (see frame_pool): hand it back with release() or frame_pool.image_from().
+    """
+    return buffer((size[1], size[0], 3), fill=color)
@@ -0,0 +1,144 @@
+import math
+import numpy as np
+from PIL import ImageColor, ImageDraw
+from functools import lru_cache
+
+from frame_pool import blend, borrowed, image_view
+
+# --- Cached Shape Masks ---
+# Shapes that recur every frame are rasterized once per (shape, size, sub-pixel
+# offset) into a cropped mask and stamped into NumPy canvases afterwards. Masks come from Pillow's own rasterizer, and Pillow's
+# output only shifts under integer translation, so a stamped shape matches
+# drawing it in place pixel for pixel. Coverage masks are supersampled instead
+# and give anti-aliased edges.
+MASK_CACHE = 1024  # Masks kept in the LRU cache
+SUPERSAMPLE = 4    # Subsamples per axis for coverage masks
+
+class Mask:
+    """
+    A cropped mask placed at (x0, y0) relative to its shape's integer origin.
+    alpha is boolean for hard masks or uint8 coverage (0-255) for soft ones.
+    """
+
+    def __init__(self, alpha, coverage=False):
+        ys, xs = np.nonzero(alpha)
+        if len(xs) == 0:
+            self.x0 = self.y0 = 0
+            alpha = alpha[:0, :0]
+        else:
+            self.x0, self.y0 = int(xs.min()), int(ys.min())
+            alpha = alpha[self.y0:ys.max() + 1, self.x0:xs.max() + 1]
+        self.coverage = coverage
+        self.alpha = np.array(alpha, dtype=np.uint8 if coverage else bool)
+        self.alpha.setflags(write=False)
+
+    @property
+    def size(self):
+        return self.alpha.shape[1], self.alpha.shape[0]
+
+def _rasterize(draw, extent, coverage):
+    # draw(ImageDraw, scale) paints 255 on an L canvas covering `extent` (w, h) pixels
+    w, h = extent
+    s = SUPERSAMPLE if coverage else 1
+    with borrowed((h * s, w * s), fill=0) as canvas:
+        draw(ImageDraw.Draw(image_view(canvas)), s)
+        if coverage:
+            # Average each s x s block into 0-255 coverage
+            return Mask(canvas.reshape(h, s, w, s).mean(axis=(1, 3)).round(), coverage=True)
+        return Mask(canvas > 0)
+
+def _origin(x, y):
+    # Integer origin to rasterize a shape from. Pillow rounds negative coordinates
+    # differently, so shapes reaching past the top or left edge are rasterized
+    # where they are (origin 0, 0) and only that exact position gets cached.
+    if x < 0 or y < 0:
+        return 0, 0
+    return math.floor(x), math.floor(y)
+
+@lru_cache(maxsize=MASK_CACHE)
+def ellipse_mask(box, width=0, coverage=False):
+    """
+    Ellipse inside box = (x0, y0, x1, y1), given relative to the mask origin
+    (normally 0 <= x0, y0 < 1). Only the part at x, y >= 0 is kept. width > 0
+    gives just the outline ring, as Pillow's ellipse(outline=..., width=...) draws it.
+    """
+    def draw(d, s):
+        scaled = [v * s for v in box]
+        if width:
+            d.ellipse(scaled, outline=255, width=width * s)
+        else:
+            d.ellipse(scaled, fill=255)
+    return _rasterize(draw, (max(math.ceil(box[2]), 0) + 2, max(math.ceil(box[3]), 0) + 2), coverage)
+
+@lru_cache(maxsize=MASK_CACHE)
+def polygon_mask(points, coverage=False):
+    """Filled polygon through points ((x, y), ...) given relative to the mask origin (x, y >= 0 kept)."""
+    def draw(d, s):
+        d.polygon([(x * s, y * s) for x, y in points], fill=255)
+    return _rasterize(draw, (max(math.ceil(max(x for x, _ in points)), 0) + 2,
+                             max(math.ceil(max(y for _, y in points)), 0) + 2), coverage)
+
+@lru_cache(maxsize=MASK_CACHE)
+def striped_disc_mask(radius, gap=4, phase=0):
+    """
+    Disc of `radius` drawn as horizontal scanlines (row i spans +-int(sqrt(r^2 - dy^2))),
+    leaving out every row whose canvas y satisfies (y % gap == 0). phase is the
+    canvas y of the disc's top row modulo gap. The mask origin is the top-left of
+    the disc's bounding square.
+    """
+    dy = np.arange(-radius, radius)
+    half = np.sqrt(radius ** 2 - dy ** 2).astype(np.intp)
+    cols = np.arange(2 * radius + 1)
+    alpha = np.abs(cols[None, :] - radius) <= half[:, None]
+    alpha[(phase + np.arange(2 * radius)) % gap == 0] = False
+    return Mask(alpha)
+
+# --- Stamping ---
+def _color(color, channels):
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    # Three-channel colors on RGBA buffers are opaque, as with ImageDraw
+    return np.array(tuple(color[:channels]) + (255,) * (channels - len(color)), dtype=np.uint8)
+
+def stamp(dst, mask, x, y, color):
+    """
+    Fills mask into an (H, W, C) uint8 array in place, with the mask origin at
+    integer (x, y), clipped to dst. Hard masks set pixels; coverage masks blend.
+    """
+    h, w, channels = dst.shape
+    mw, mh = mask.size
+    left, top = x + mask.x0, y + mask.y0
+    sx0, sy0 = max(0, -left), max(0, -top)
+    sx1, sy1 = min(mw, w - left), min(mh, h - top)
+    if sx0 >= sx1 or sy0 >= sy1:
+        return dst
+    region = dst[top + sy0:top + sy1, left + sx0:left + sx1]
+    alpha = mask.alpha[sy0:sy1, sx0:sx1]
+    if mask.coverage:
+        blend(region, _color(color, channels), alpha)
+    else:
+        np.copyto(region, _color(color, channels), where=alpha[..., None])
+    return dst
+
+# --- Drop-In Shapes (same coordinates as ImageDraw) ---
+def fill_ellipse(dst, box, fill=None, outline=None, width=1):
+    """Like ImageDraw.ellipse(box, fill, outline, width), stamped from cached masks."""
+    ix, iy = _origin(box[0], box[1])
+    local = (box[0] - ix, box[1] - iy, box[2] - ix, box[3] - iy)
+    if fill is not None:
+        stamp(dst, ellipse_mask(local), ix, iy, fill)
+    if outline is not None and outline != fill and width:
+        stamp(dst, ellipse_mask(local, width), ix, iy, outline)
+    return dst
+
+def fill_polygon(dst, points, fill):
+    """Like ImageDraw.polygon(points, fill), stamped from a cached mask."""
+    ix, iy = _origin(min(x for x, _ in points), min(y for _, y in points))
+    stamp(dst, polygon_mask(tuple((x - ix, y - iy) for x, y in points)), ix, iy, fill)
+    return dst
+
+def fill_striped_disc(dst, cx, cy, radius, fill, gap=4):
+    """Scanline disc centered on integer (cx, cy); rows with y % gap == 0 stay empty."""
+    top = cy - radius
+    stamp(dst, striped_disc_mask(radius, gap, top % gap), cx - radius, top, fill)
+    return dst
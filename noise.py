@@ -0,0 +1,118 @@
+import numpy as np
+from functools import lru_cache
+
+# --- Vectorized Value / Gradient Noise ---
+# Lattice noise in 1, 2 or 3 dimensions. Every function takes whole coordinate
+# arrays (anything that broadcasts together) and evaluates them in one pass, so
+# a terrain row, a flow grid or a stack of grids over time costs a few NumPy ops.
+TABLE_SIZE = 256
+
+# 3D gradients: the 12 cube edge midpoints (Perlin's improved-noise set)
+GRADIENTS_3D = np.array([
+    (1, 1, 0), (-1, 1, 0), (1, -1, 0), (-1, -1, 0),
+    (1, 0, 1), (-1, 0, 1), (1, 0, -1), (-1, 0, -1),
+    (0, 1, 1), (0, -1, 1), (0, 1, -1), (0, -1, -1),
+], dtype=np.float64)
+# 2D gradients: 8 evenly spaced unit vectors
+GRADIENTS_2D = np.stack([np.cos(np.arange(8) * np.pi / 4), np.sin(np.arange(8) * np.pi / 4)], axis=1)
+# Rescales gradient noise so its extremes land near -1 and 1
+GRADIENT_SCALE = {1: 2.0, 2: np.sqrt(2), 3: 1.0}
+
+@lru_cache(maxsize=64)
+def permutation(seed):
+    """Seeded permutation of 0..255 (read-only), the hash behind every lattice point."""
+    perm = np.random.default_rng(seed).permutation(TABLE_SIZE)
+    perm.setflags(write=False)
+    return perm
+
+def _fade(t):
+    # Quintic smoothstep: zero first and second derivatives at the lattice points
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+def _lattice(coords, period):
+    """Splits coordinates into integer cells and fractions; cells wrap at `period` for tiling."""
+    coords = np.broadcast_arrays(*[np.asarray(c, dtype=np.float64) for c in coords])
+    if period is not None and np.isscalar(period):
+        period = [period] * len(coords)
+    cells, fracs = [], []
+    for axis, c in enumerate(coords):
+        i = np.floor(c)
+        fracs.append(c - i)
+        i = i.astype(np.int64)
+        p = period[axis] if period is not None else None
+        cells.append((i, i + 1) if p is None else (i % p, (i + 1) % p))
+    return cells, fracs
+
+def _hash(perm, corner):
+    h = perm[corner[0] & 255]
+    for i in corner[1:]:
+        h = perm[(h + i) & 255]
+    return h
+
+def _corners(dims):
+    # Every corner of a unit (hyper)cube as a tuple of 0/1 offsets
+    return [tuple((n >> axis) & 1 for axis in range(dims)) for n in range(1 << dims)]
+
+def _interpolate(values, fracs):
+    # values is keyed by corner; collapse one axis at a time with the faded weights
+    for axis in reversed(range(len(fracs))):
+        u = _fade(fracs[axis])
+        values = {c[:axis]: values[c[:axis] + (0,)] + u * (values[c[:axis] + (1,)] - values[c[:axis] + (0,)])
+                  for c in values if c[axis] == 0}
+    return values[()]
+
+def value_noise(*coords, seed=0, period=None):
+    """
+    Value noise in [0, 1] at the given x (, y (, z)) coordinate arrays: random
+    values on the integer lattice, smoothly interpolated in between.
+    `period` (an int, or one int or None per axis) makes the noise tile along
+    those axes.
+    """
+    perm = permutation(seed)
+    cells, fracs = _lattice(coords, period)
+    values = {}
+    for corner in _corners(len(coords)):
+        values[corner] = _hash(perm, [cells[axis][o] for axis, o in enumerate(corner)]) / (TABLE_SIZE - 1)
+    return _interpolate(values, fracs)
+
+def gradient_noise(*coords, seed=0, period=None):
+    """
+    Gradient (Perlin) noise in roughly [-1, 1] at the given x (, y (, z))
+    coordinate arrays. It is zero on the lattice points, which avoids the blocky
+    look of value noise. `period` works like in value_noise.
+    """
+    dims = len(coords)
+    if not 1 <= dims <= 3:
+        raise ValueError(f"gradient_noise supports 1 to 3 dimensions, got {dims}")
+    perm = permutation(seed)
+    cells, fracs = _lattice(coords, period)
+    values = {}
+    for corner in _corners(dims):
+        h = _hash(perm, [cells[axis][o] for axis, o in enumerate(corner)])
+        offsets = [fracs[axis] - o for axis, o in enumerate(corner)]
+        if dims == 1:
+            values[corner] = (h / 127.5 - 1) * offsets[0]
+        else:
+            grads = GRADIENTS_2D[h & 7] if dims == 2 else GRADIENTS_3D[h % 12]
+            values[corner] = sum(grads[..., axis] * offsets[axis] for axis in range(dims))
+    return _interpolate(values, fracs) * GRADIENT_SCALE[dims]
+
+def fractal_noise(noise, *coords, octaves=4, lacunarity=2.0, gain=0.5, seed=0, period=None):
+    """
+    Sums `octaves` layers of value_noise or gradient_noise, each at `lacunarity`
+    times the frequency and `gain` times the amplitude of the last, normalized
+    back to the range of one layer. Each octave gets its own permutation table.
+    With `period`, keep lacunarity an integer so every octave still tiles.
+    """
+    if period is not None and np.isscalar(period):
+        period = [period] * len(coords)
+    total = 0.0
+    amplitude, frequency, norm = 1.0, 1.0, 0.0
+    for octave in range(octaves):
+        scaled = [np.asarray(c, dtype=np.float64) * frequency for c in coords]
+        octave_period = None if period is None else [None if p is None else int(p * frequency) for p in period]
+        total = total + amplitude * noise(*scaled, seed=seed + octave, period=octave_period)
+        norm += amplitude
+        amplitude *= gain
+        frequency *= lacunarity
+    return total / norm
@@ -0,0 +1,6 @@
+# --- Output Formats ---
+# Names shared by the CLI and frame_sinks. Kept apart from the sinks so that
+# parsing arguments never imports numpy or Pillow.
+FORMATS = ("gif", "png", "raw", "rgba", "y4m")
+EXTENSIONS = {"gif": ".gif", "png": "", "raw": ".rgb", "rgba": ".rgba", "y4m": ".y4m"}
+STDOUT = "-"  # Output path meaning the process's stdout
@@ -1,12 +1,27 @@
 import numpy as np
-from PIL import Image, ImageDraw
 import random
 import math
+import os
+from functools import partial
+
+from frame_pool import buffer, image_from
+from gif_writer import write_gif
+from gradient import vertical_gradient
+from instrument import stage
+from layers import composite, static_layer
+from masks import fill_striped_disc
+from noise import fractal_noise, gradient_noise
+from render_cache import cached_render
+from render_farm import imap_frames
 
 # Image Config
 WIDTH, HEIGHT = 320, 180  # Low res for Pixel Art feel
 FRAMES = 30
+SCALE = 2
 OUTPUT_FILENAME = "lofi_pixel_art.gif"
+SKYLINE = "walk"       # Mountains: "walk" (random walk) or "noise" (1D fractal gradient noise)
+MOUNTAIN_SCALE = 40    # Pixels per noise lattice cell along the skyline (noise skyline)
+MOUNTAIN_HEIGHT = 25   # Peak deviation from the baseline in pixels (noise skyline)
 
 def lerp_color(c1, c2, t):
     return tuple(int(a + (b - a) * t) for a, b in zip(c1, c2))
@@ -21,34 +36,21 @@ def generate_sky(width, height, t_offset):
         (250, 150, 50)  # Orange Sun
     ]
     
-    pixels = np.zeros((height, width, 3), dtype=np.uint8)
-    
-    for y in range(height):
-        # Calculate gradient position (0.0 to 1.0)
-        # Add slight sine wave for "heat haze" or atmosphere movement
-        y_norm = y / height
-        shift = math.sin(y_norm * 5 + t_offset) * 0.05
-        pos = np.clip(y_norm + shift, 0, 1) * (len(colors) - 1)
-        
-        idx = int(pos)
-        t = pos - idx
-        c = lerp_color(colors[idx], colors[min(idx+1, len(colors)-1)], t)
-        pixels[y, :] = c
-        
-    return pixels
+    # Whole frame in one broadcast, with a slight sine wave
+    # for "heat haze" or atmosphere movement
+    return buffer((height, width, 3), fill=vertical_gradient(width, height, colors, t_offset, haze=0.05, freq=5)[0])
 
-def add_stars(pixels, count=50, seed=42):
+def draw_stars(draw, size, count=50, seed=42):
     rng = random.Random(seed)
-    h, w, _ = pixels.shape
+    w, h = size
     for _ in range(count):
         x = rng.randint(0, w-1)
         y = rng.randint(0, h//2) # Stars only in upper half
         # Twinkle check could go here, but static stars for now
         if rng.random() > 0.1: 
-            pixels[y, x] = (255, 255, 200)
-    return pixels
+            draw.point((x, y), fill=(255, 255, 200))
 
-def generate_mountains(width, height, seed=1):
+def walk_mountains(width, height, seed=1):
     # 1D Noise for terrain
     rng = random.Random(seed)
     skyline = []
@@ -61,76 +63,81 @@ def generate_mountains(width, height, seed=1):
         skyline.append(int(y))
     return skyline
 
-def draw_scene(frame_idx):
-    t = frame_idx / FRAMES * 2 * math.pi
-    
-    # 1. Base Sky
-    pixels = generate_sky(WIDTH, HEIGHT, t)
-    pixels = add_stars(pixels)
-    
-    # Convert to PIL for drawing shapes easily
-    img = Image.fromarray(pixels)
-    draw = ImageDraw.Draw(img)
-    
-    # 2. Sun (Retro style)
-    # Sun moves slightly down
-    sun_y = int(HEIGHT/2 + math.sin(t)*5)
-    sun_x = int(WIDTH/2)
-    sun_r = 30
-    
-    # Draw sun with scanlines (retro aesthetic)
-    for y in range(sun_y - sun_r, sun_y + sun_r):
-        if y % 4 == 0: continue # Scanline gap
-        width_at_y = int(math.sqrt(sun_r**2 - (y - sun_y)**2))
-        draw.line([(sun_x - width_at_y, y), (sun_x + width_at_y, y)], fill=(255, 200, 50))
-
-    # 3. Mountains (Black Silhouette)
-    skyline = generate_mountains(WIDTH, HEIGHT)
-    # To smooth it slightly
-    # Draw
-    polygon = [(0, HEIGHT)] # Start bottom left
+def noise_mountains(width, height, seed=1):
+    # 1D fractal noise for terrain, every column at once
+    x = np.arange(width) / MOUNTAIN_SCALE
+    ridge = fractal_noise(gradient_noise, x, octaves=4, seed=seed)
+    # Centered on the walk's baseline and kept between mid-screen and the water line
+    skyline = height // 2 + 20 + ridge * MOUNTAIN_HEIGHT
+    return np.clip(skyline, height // 2, height - 40).astype(int).tolist()
+
+SKYLINES = {"walk": walk_mountains, "noise": noise_mountains}
+
+def generate_mountains(width, height, seed=1):
+    return SKYLINES[SKYLINE](width, height, seed)
+
+def draw_land(draw, size):
+    w, h = size
+    # Mountains (Black Silhouette)
+    skyline = generate_mountains(w, h)
+    polygon = [(0, h)] # Start bottom left
     for x, y in enumerate(skyline):
         polygon.append((x, y))
-    polygon.append((WIDTH, HEIGHT)) # End bottom right
-    
+    polygon.append((w, h)) # End bottom right
     draw.polygon(polygon, fill=(10, 5, 20))
     
-    # 4. Water Reflection (The "Refined" part - pixel distortion)
-    # Take the top half, flip it, distort x
+    # Water Reflection (The "Refined" part - pixel distortion)
     # For simplicity in PIL, let's just draw a reflective gradient overlay
-    # Or actually manipulate pixels. Let's do a simple overlay.
-    
-    # Water surface area
-    water_y = max(skyline)
     # Make water area distinct
-    draw.rectangle([(0, HEIGHT-40), (WIDTH, HEIGHT)], fill=(20, 10, 40))
+    draw.rectangle([(0, h-40), (w, h)], fill=(20, 10, 40))
+
+def draw_scene(frame_idx, frames=FRAMES, size=(WIDTH, HEIGHT)):
+    t = frame_idx / frames * 2 * math.pi
+    width, height = size
+    
+    # Only the sky and the glimmer change every frame; stars and land are
+    # static layers rasterized once and blitted, the sun a cached mask stamp
+    
+    # 1. Base Sky
+    with stage("background"):
+        pixels = generate_sky(width, height, t)
+        composite(pixels, static_layer(draw_stars, size, size, 50, 42))
     
-    # Add "glimmer" on water
-    rng = random.Random(frame_idx)
-    for _ in range(100):
-        rx = rng.randint(0, WIDTH-1)
-        ry = rng.randint(HEIGHT-40, HEIGHT-1)
-        if rng.random() > 0.8:
-            draw.point((rx, ry), fill=(100, 80, 150)) # Purple glimmer
-
-    return img
-
-# Generate Frames
-images = []
-print("Rendering frames...")
-for i in range(FRAMES):
-    img = draw_scene(i)
-    # Scale up for visibility (Nearest Neighbor for pixel art look)
-    img = img.resize((WIDTH*2, HEIGHT*2), Image.NEAREST)
-    images.append(img)
-
-# Save GIF
-print(f"Saving {OUTPUT_FILENAME}...")
-images[0].save(
-    OUTPUT_FILENAME,
-    save_all=True,
-    append_images=images[1:],
-    duration=100, # ms per frame
-    loop=0
-)
-print("Done!")
+    with stage("shapes"):
+        # 2. Sun (Retro style)
+        # Sun moves slightly down
+        sun_y = int(height/2 + math.sin(t)*5)
+        sun_x = int(width/2)
+        # Sun with scanlines (retro aesthetic): one cached mask per scanline phase
+        fill_striped_disc(pixels, sun_x, sun_y, 30, (255, 200, 50), gap=4)
+
+        # 3. Mountains and water
+        composite(pixels, static_layer(draw_land, size, size))
+        
+        # 4. Add "glimmer" on water
+        rng = random.Random(frame_idx)
+        for _ in range(100):
+            rx = rng.randint(0, width-1)
+            ry = rng.randint(height-40, height-1)
+            if rng.random() > 0.8:
+                pixels[ry, rx] = (100, 80, 150) # Purple glimmer
+
+    with stage("convert"):
+        return image_from(pixels)
+
+@cached_render
+def generate_lofi_pixel_art(frames=FRAMES, size=None, scale=None, output_dir=".", workers=1):
+    # Generate Frames (draw_scene depends only on the frame index, so frames can render in parallel)
+    print("Rendering frames...")
+    images = imap_frames(partial(draw_scene, frames=frames, size=size or (WIDTH, HEIGHT)), frames, workers)
+
+    # Stream each frame into the GIF as soon as it is rendered
+    # Scale up for visibility (Nearest Neighbor for pixel art look, done by the encoder)
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, OUTPUT_FILENAME)
+    print(f"Saving {output_path}...")
+    write_gif(output_path, images, duration=100, scale=scale or SCALE) # ms per frame
+    print("Done!")
+
+if __name__ == "__main__":
+    generate_lofi_pixel_art()
@@ -0,0 +1,59 @@
+import numpy as np
+
+# --- Batched Segment Rasterizer ---
+def segment_pixels(x0, y0, x1, y1, width, height, origin=(0, 0)):
+    """
+    Walks every segment with a vectorized DDA. Returns (seg, flat) arrays: the owning
+    segment index and the flat buffer index (y * width + x) of each covered pixel.
+    Pixels outside the buffer are dropped and each pixel is emitted at most once per segment.
+    Coordinates are in a larger canvas whose pixel `origin` is the buffer's top-left;
+    pixels are rounded before the shift, so a tile covers exactly the pixels the
+    whole canvas would.
+    """
+    x0, y0, x1, y1 = (np.asarray(v, dtype=np.float64) for v in (x0, y0, x1, y1))
+    dx, dy = x1 - x0, y1 - y0
+    steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.intp) + 1
+
+    seg = np.repeat(np.arange(len(steps)), steps)
+    start = np.cumsum(steps) - steps
+    k = np.arange(len(seg)) - start[seg]
+    t = k / np.maximum(steps - 1, 1)[seg]
+    px = np.rint(x0[seg] + dx[seg] * t).astype(np.intp)
+    py = np.rint(y0[seg] + dy[seg] * t).astype(np.intp)
+    if origin != (0, 0):
+        px -= origin[0]
+        py -= origin[1]
+
+    keep = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    # Consecutive samples of one segment can round onto the same pixel
+    repeat = np.zeros_like(keep)
+    repeat[1:] = (seg[1:] == seg[:-1]) & (px[1:] == px[:-1]) & (py[1:] == py[:-1])
+    keep &= ~repeat
+    return seg[keep], py[keep] * width + px[keep]
+
+def draw_segments(buf, x0, y0, x1, y1, colors, alpha=None, mode="add", origin=(0, 0)):
+    """
+    Draws all segments into a float (H, W, C) accumulation buffer in one call.
+    colors is (N, C); alpha (N,) in 0..1 scales each segment's contribution.
+    mode "add" sums overlapping segments, "max" keeps the brightest one.
+    origin places the buffer inside a larger canvas (see segment_pixels).
+    """
+    h, w, channels = buf.shape
+    seg, flat = segment_pixels(x0, y0, x1, y1, w, h, origin)
+    if len(seg) == 0:
+        return buf
+
+    value = np.asarray(colors, dtype=buf.dtype)
+    if alpha is not None:
+        value = value * np.asarray(alpha, dtype=buf.dtype)[:, None]
+    value = value[seg]
+
+    target = buf.reshape(-1, channels)
+    if mode == "add":
+        for ch in range(channels):
+            target[:, ch] += np.bincount(flat, weights=value[:, ch], minlength=h * w).astype(buf.dtype)
+    elif mode == "max":
+        np.maximum.at(target, flat, value)
+    else:
+        raise ValueError(f"Unknown blend mode: {mode}")
+    return buf
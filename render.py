@@ -0,0 +1,167 @@
+import argparse
+import contextlib
+import importlib
+import inspect
+import sys
+import time
+
+import instrument
+from output_formats import FORMATS, STDOUT
+
+# --- Generator Registry ---
+# name -> (module, function). Modules are only imported when a generator runs,
+# so listing and argument parsing stay fast and nothing renders on import.
+GENERATORS = {
+    "lofi_pixel_art": ("pixel_art_gen", "generate_lofi_pixel_art"),
+    "flow_field_art": ("flow_field_gen", "generate_flow_field_art"),
+    "sky_island": ("fantasy_gen", "generate_sky_island"),
+    "crystal_cave": ("fantasy_gen", "generate_crystal_cave"),
+    "cartoon_character": ("cartoon_gen", "generate_cartoon_character"),
+    "cat": ("animal_pixels", "generate_cat"),
+    "rabbit": ("animal_pixels", "generate_rabbit"),
+    "dog": ("animal_pixels", "generate_dog"),
+    "cat_refined": ("animal_pixels_refined", "generate_cat_refined"),
+    "rabbit_refined": ("animal_pixels_refined", "generate_rabbit_refined"),
+    "dog_refined": ("animal_pixels_refined", "generate_dog_refined"),
+}
+
+def resolve(name):
+    """Looks up a generator by registry name or by its function name (generate_*)."""
+    if name.startswith("generate_"):
+        for key, (_, func) in GENERATORS.items():
+            if func == name:
+                name = key
+                break
+    if name not in GENERATORS:
+        raise KeyError(f"Unknown generator '{name}'. Run 'python -m render list' to see them all.")
+    return name
+
+def load(name):
+    """Imports the generator's module (on first use) and returns its function."""
+    module, func = GENERATORS[resolve(name)]
+    return getattr(importlib.import_module(module), func)
+
+def unsupported(name, overrides):
+    """Names of the overrides (with a value) that the generator does not take."""
+    accepted = inspect.signature(load(name)).parameters
+    return sorted(k for k, v in overrides.items() if v is not None and k not in accepted)
+
+def render(name, **overrides):
+    """
+    Runs one generator with the given overrides (frames, size, scale, output_dir,
+    workers, particle_count, tile_size, palette, output_format, output, store,
+    checkpoint_every). None values are left at the generator's default.
+    """
+    bad = unsupported(name, overrides)
+    if bad:
+        raise ValueError(f"{resolve(name)} does not support: {', '.join(bad)}")
+    return load(name)(**{k: v for k, v in overrides.items() if v is not None})
+
+# --- CLI ---
+def parse_size(text):
+    try:
+        w, h = text.lower().split("x")
+        return int(w), int(h)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Size must look like 640x360, got '{text}'")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m render", description="Render the pixel art and generative animations.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="List every registered generator")
+    clear = sub.add_parser("clear-cache", help="Delete the render cache")
+    clear.add_argument("--cache-dir", help="Cache directory (default .render_cache)")
+
+    run = sub.add_parser("render", help="Render one or more generators")
+    run.add_argument("names", nargs="*", help="Generator names (see 'list')")
+    run.add_argument("--all", action="store_true", help="Render every registered generator")
+    run.add_argument("--frames", type=int, help="Number of frames")
+    run.add_argument("--size", type=parse_size, help="Native canvas size, e.g. 640x360")
+    run.add_argument("--scale", type=int, help="Integer output upscale factor")
+    run.add_argument("--output-dir", help="Directory to write outputs to")
+    run.add_argument("--workers", type=int, help="Worker processes for frame rendering (0 = one per CPU)")
+    run.add_argument("--particles", type=int, dest="particle_count", help="Particle count (flow field)")
+    run.add_argument("--tile-size", type=parse_size, help="Flow field tile per worker, e.g. 960x540 (large canvases)")
+    run.add_argument("--format", dest="output_format", choices=FORMATS,
+                     help="Output format: gif, png (numbered sequence), raw (RGB), rgba or y4m")
+    run.add_argument("--output", help="Output file, named pipe or - for stdout (all formats but png)")
+    run.add_argument("--store", metavar="DIR",
+                     help="Render into an on-disk frame store with checkpoints; rerun to resume (flow field)")
+    run.add_argument("--checkpoint-every", type=int, metavar="N", help="Frames between store checkpoints")
+    run.add_argument("--palette", help="Color variant (animals, e.g. grey or tuxedo)")
+    run.add_argument("--cache", action="store_true", help="Reuse cached outputs and frames (see render_cache)")
+    run.add_argument("--cache-dir", help="Cache directory (default .render_cache; implies --cache)")
+    run.add_argument("--cache-max-mb", type=float, help="Evict least recently used entries past this size")
+    run.add_argument("--timings", metavar="PATH", help="Time every frame stage and write a JSON summary here")
+    run.add_argument("--chrome-trace", metavar="PATH", help="Time every frame stage and write a Chrome trace here")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "output_format", None) == "png" and args.output == STDOUT:
+        # A png sequence is a directory of files; there is no single stream to write
+        parser.error("--format png cannot write to stdout (--output -); give a directory")
+
+    if args.command == "list":
+        for name, (module, func) in GENERATORS.items():
+            print(f"{name:<20} {module}.{func}")
+        return 0
+    if args.command == "clear-cache":
+        import render_cache  # Imported here so 'list' and --help never load numpy or Pillow
+        render_cache.clear(args.cache_dir)
+        return 0
+
+    names = list(GENERATORS) if args.all else args.names
+    if not names:
+        print("Nothing to render: give generator names or --all", file=sys.stderr)
+        return 2
+    try:
+        names = [resolve(n) for n in names]
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 2
+
+    # Frames streamed to stdout must not be mixed with progress text
+    quiet = contextlib.redirect_stdout(sys.stderr) if args.output == STDOUT else contextlib.nullcontext()
+    with quiet:
+        return run(args, names)
+
+def run(args, names):
+    """Renders the resolved generator names with the parsed CLI options."""
+    if args.timings or args.chrome_trace:
+        instrument.enable()
+    if args.cache or args.cache_dir:
+        import render_cache
+        render_cache.enable(args.cache_dir, args.cache_max_mb and int(args.cache_max_mb * 2**20))
+
+    overrides = dict(frames=args.frames, size=args.size, scale=args.scale,
+                     output_dir=args.output_dir, workers=args.workers,
+                     particle_count=args.particle_count, tile_size=args.tile_size, palette=args.palette,
+                     output_format=args.output_format, output=args.output,
+                     store=args.store, checkpoint_every=args.checkpoint_every)
+    for name in names:
+        bad = unsupported(name, overrides)
+        if bad and not args.all:
+            print(f"{name} does not support: {', '.join(bad)}", file=sys.stderr)
+            return 2
+        # With --all, each generator just takes the overrides it understands
+        kwargs = {k: v for k, v in overrides.items() if k not in bad}
+        instrument.set_label(name)
+        start = time.perf_counter()
+        try:
+            render(name, **kwargs)
+        except ValueError as e:
+            print(f"{name}: {e}", file=sys.stderr)
+            return 2
+        print(f"[{name}] {time.perf_counter() - start:.2f}s")
+
+    if args.timings:
+        print(f"Wrote {instrument.write_json(args.timings)}")
+    if args.chrome_trace:
+        print(f"Wrote {instrument.write_chrome_trace(args.chrome_trace)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
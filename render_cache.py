@@ -0,0 +1,199 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from PIL import Image
+
+from instrument import stage
+
+# --- Content-Addressed Render Cache ---
+# Off unless RENDER_CACHE is set (to a directory, or 1 for the default one) or
+# enable() is called. Keys hash the generator, its parameters (seeds included)
+# and the source of every local module it uses, so editing the code is enough
+# to invalidate old entries.
+CACHE_DIR = ".render_cache"
+MAX_BYTES = 1 << 30  # Least recently used entries are evicted past this size
+IGNORED_PARAMS = ("output_dir", "workers", "store", "checkpoint_every")  # Do not change what gets rendered
+
+_env = os.environ.get("RENDER_CACHE", "")
+ENABLED = _env not in ("", "0")
+_directory = _env if ENABLED and _env != "1" else CACHE_DIR
+_max_bytes = int(float(os.environ.get("RENDER_CACHE_MAX_MB", MAX_BYTES / 2**20)) * 2**20)
+
+def enable(directory=None, max_bytes=None):
+    global ENABLED, _directory, _max_bytes
+    ENABLED = True
+    _directory = directory or _directory
+    _max_bytes = max_bytes or _max_bytes
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def cache_dir():
+    return _directory
+
+# --- Keys ---
+def _local_modules(module, root, seen):
+    # The module plus every module from the same directory it reaches through its globals
+    seen[module.__name__] = module
+    for value in vars(module).values():
+        dep = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+        path = getattr(dep, "__file__", None)
+        if path and dep.__name__ not in seen and os.path.dirname(os.path.abspath(path)) == root:
+            _local_modules(dep, root, seen)
+    return seen
+
+@functools.lru_cache(maxsize=None)
+def source_digest(module_name):
+    """Hash of a module's source and of the local modules it depends on."""
+    module = sys.modules[module_name]
+    root = os.path.dirname(os.path.abspath(module.__file__))
+    h = hashlib.sha256()
+    for name, dep in sorted(_local_modules(module, root, {}).items()):
+        h.update(name.encode())
+        with open(dep.__file__, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def make_key(name, params, module_name):
+    material = json.dumps([name, params, source_digest(module_name)], sort_keys=True, default=repr)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+# --- Storage ---
+def _touch(path):
+    os.utime(path)  # mtime doubles as the last-used time for eviction
+
+def _entries(directory):
+    # (last used, size, path) for every evictable entry: output dirs and frame files
+    entries = []
+    outputs = os.path.join(directory, "outputs")
+    if os.path.isdir(outputs):
+        for entry in os.scandir(outputs):
+            size = sum(f.stat().st_size for f in os.scandir(entry.path))
+            entries.append((entry.stat().st_mtime, size, entry.path))
+    frames = os.path.join(directory, "frames")
+    if os.path.isdir(frames):
+        for group in os.scandir(frames):
+            for entry in os.scandir(group.path):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    return entries
+
+def evict(directory=None, max_bytes=None):
+    """Deletes least recently used entries until the cache fits in max_bytes. Returns bytes freed."""
+    directory = directory or _directory
+    max_bytes = _max_bytes if max_bytes is None else max_bytes
+    entries = sorted(_entries(directory))
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    for _, size, path in entries:
+        if total - freed <= max_bytes:
+            break
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+        freed += size
+    return freed
+
+def clear(directory=None):
+    shutil.rmtree(directory or _directory, ignore_errors=True)
+
+def _snapshot(directory):
+    if not os.path.isdir(directory):
+        return {}
+    return {e.name: (e.stat().st_mtime_ns, e.stat().st_size) for e in os.scandir(directory) if e.is_file()}
+
+# --- Finished Outputs ---
+def cached_render(generate=None, keep=()):
+    """
+    Decorates a generate_* function so that, while the cache is enabled, a call
+    whose key was seen before copies the stored outputs into output_dir instead
+    of rendering. Outputs are whatever files the call created or rewrote
+    directly inside output_dir (None means the module's OUTPUT_DIR).
+    Parameters in `keep` stay in the key even if IGNORED_PARAMS lists them, for
+    generators where they change the frames (@cached_render(keep=("workers",))).
+    """
+    if generate is None:
+        return functools.partial(cached_render, keep=keep)
+    signature = inspect.signature(generate)
+    ignored = [p for p in IGNORED_PARAMS if p not in keep]
+
+    @functools.wraps(generate)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return generate(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if bound.arguments.get("output") is not None or bound.arguments.get("output_format") == "png":
+            # Streams, pipes and PNG directories are not files in output_dir; always render
+            return generate(*args, **kwargs)
+        params = {k: v for k, v in bound.arguments.items() if k not in ignored}
+        key = make_key(f"{generate.__module__}.{generate.__qualname__}", params, generate.__module__)
+        output_dir = bound.arguments.get("output_dir") or getattr(sys.modules[generate.__module__], "OUTPUT_DIR", ".")
+        entry = os.path.join(_directory, "outputs", key)
+
+        if os.path.isdir(entry):
+            with stage("cache"):
+                os.makedirs(output_dir, exist_ok=True)
+                for name in os.listdir(entry):
+                    shutil.copyfile(os.path.join(entry, name), os.path.join(output_dir, name))
+                _touch(entry)
+            print(f"[cache] {generate.__name__}: reused {', '.join(sorted(os.listdir(entry)))}")
+            return None
+
+        before = _snapshot(output_dir)
+        result = generate(*args, **kwargs)
+        after = _snapshot(output_dir)
+        produced = [name for name, stat in after.items() if before.get(name) != stat]
+
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(entry))
+        for name in produced:
+            shutil.copyfile(os.path.join(output_dir, name), os.path.join(staging, name))
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)  # Another run stored it first
+        evict()
+        return result
+
+    return wrapper
+
+# --- Individual Frames ---
+class CachedFrame:
+    """
+    Picklable wrapper around a render_frame callable that stores each frame it
+    renders as a .npy file and loads it back on later calls. The key prefix is
+    built once in the parent, so worker processes only touch the disk.
+    """
+
+    def __init__(self, render_frame, directory=None):
+        func, args, kwargs = render_frame, (), {}
+        if isinstance(render_frame, functools.partial):
+            func, args, kwargs = render_frame.func, render_frame.args, render_frame.keywords
+        name = f"{func.__module__}.{func.__qualname__}"
+        self.render_frame = render_frame
+        self.path = os.path.join(directory or _directory, "frames",
+                                 make_key(name, [args, kwargs], func.__module__))
+
+    def __call__(self, f):
+        path = os.path.join(self.path, f"{f}.npy")
+        if os.path.exists(path):
+            with stage("cache"):
+                frame = Image.fromarray(np.load(path))
+                _touch(path)
+            return frame
+        frame = self.render_frame(f)
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fp:
+            np.save(fp, np.asarray(frame))
+        os.replace(tmp, path)
+        return frame
@@ -0,0 +1,70 @@
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import instrument
+import render_cache
+
+# --- Deterministic Per-Frame Randomness ---
+def frame_rng(seed, frame_idx):
+    """
+    Independent random stream for one frame. It depends only on (seed, frame_idx),
+    never on global state or on which process renders the frame, so parallel and
+    serial renders draw the same numbers.
+    """
+    return random.Random(f"{seed}:{frame_idx}")
+
+# --- Process-Pool Frame Rendering ---
+def _render_one(render_frame, f):
+    instrument.set_frame(f)
+    with instrument.stage("frame"):
+        return render_frame(f)
+
+def _render_range(render_frame, start, stop):
+    # Stage timings recorded in the worker travel back with the frames
+    return [_render_one(render_frame, f) for f in range(start, stop)], instrument.drain()
+
+def _collect(future, start):
+    frames, events = future.result()
+    instrument.merge(events)
+    for f, frame in enumerate(frames, start):
+        instrument.set_frame(f)  # Encode stages in the parent belong to this frame
+        yield frame
+
+def imap_frames(render_frame, frames, workers=1, chunk_size=None):
+    """
+    Yields render_frame(f) for f in range(frames), in frame order.
+    With workers > 1 (0 means one per CPU) contiguous frame ranges are spread over a
+    process pool. render_frame must be picklable (a module-level function, or a
+    functools.partial of one) and depend only on the frame index.
+    Only a few ranges are in flight at once, so results never pile up in memory.
+    While the render cache is enabled, frames rendered before are loaded from disk.
+    """
+    if render_cache.ENABLED:
+        render_frame = render_cache.CachedFrame(render_frame)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, frames)
+    if workers <= 1:
+        for f in range(frames):
+            yield _render_one(render_frame, f)
+        return
+
+    if chunk_size is None:
+        chunk_size = max(1, frames // (workers * 4))
+    ranges = [(start, min(start + chunk_size, frames)) for start in range(0, frames, chunk_size)]
+
+    # Forked workers start with a copy of the parent's timings; drop it
+    with ProcessPoolExecutor(max_workers=workers, initializer=instrument.drain) as pool:
+        pending = deque()
+        for start, stop in ranges:
+            pending.append((pool.submit(_render_range, render_frame, start, stop), start))
+            if len(pending) >= workers * 2:
+                yield from _collect(*pending.popleft())
+        while pending:
+            yield from _collect(*pending.popleft())
+
+def render_frames(render_frame, frames, workers=1, chunk_size=None):
+    """Renders every frame (see imap_frames) and returns them as a list in order."""
+    return list(imap_frames(render_frame, frames, workers, chunk_size))
@@ -1,33 +1,59 @@
 from manim import *
 
-class StudyAnimation(Scene):
+from scene_profile import ProfiledScene
+
+class StudyAnimation(ProfiledScene, Scene):  # SCENE_PROFILE=檔名.csv 時記錄每個 play/wait 的耗時
+    # 可調參數（預設值即原本的動畫；建構時傳入即可產生變體，見 batch_scenes.py）
+    title = "OpenClaw Animation Study"
+    palette = (BLUE, RED, GREEN)  # 圓形、正方形、三角形
+    radius = 1.5                  # 圓形半徑，正方形與三角形隨之縮放
+    # 各段動畫秒數；None 代表沿用 Manim 預設的 run_time
+    timings = {"title": None, "create": None, "transform": None, "rotate": 2, "split": None, "fade": 2, "pause": 1}
+
+    def __init__(self, title=None, palette=None, radius=None, timings=None, **kwargs):
+        super().__init__(**kwargs)
+        if title is not None:
+            self.title = title
+        if palette is not None:
+            self.palette = palette
+        if radius is not None:
+            self.radius = radius
+        self.timings = {**type(self).timings, **(timings or {})}
+
+    def run_time(self, step):
+        seconds = self.timings[step]
+        return {} if seconds is None else {"run_time": seconds}
+
     def construct(self):
+        circle_color, square_color, triangle_color = self.palette
+        pause = self.timings["pause"]
+
         # 1. 建立幾何圖形
-        circle = Circle(radius=1.5, color=BLUE)
-        square = Square(side_length=2, color=RED)
-        triangle = Triangle().scale(1.5).set_color(GREEN)
+        circle = Circle(radius=self.radius, color=circle_color)
+        square = Square(side_length=self.radius * 4 / 3, color=square_color)
+        triangle = Triangle().scale(self.radius).set_color(triangle_color)
 
         # 2. 文字標題
-        title = Text("OpenClaw Animation Study", font_size=36).to_edge(UP)
+        title = Text(self.title, font_size=36).to_edge(UP)
 
         # 3. 動畫流程 (總計約 15 秒)
-        
+
         # [0-2s] 標題與圓形出現
-        self.play(Write(title))
-        self.play(Create(circle))
-        self.wait(1)
+        self.play(Write(title), **self.run_time("title"))
+        self.play(Create(circle), **self.run_time("create"))
+        self.wait(pause)
 
         # [3-6s] 圓形變形為正方形
-        self.play(ReplacementTransform(circle, square))
-        self.wait(1)
+        self.play(ReplacementTransform(circle, square), **self.run_time("transform"))
+        self.wait(pause)
 
         # [7-10s] 正方形變形為三角形，並旋轉
-        self.play(ReplacementTransform(square, triangle))
-        self.play(Rotate(triangle, angle=PI*2), run_time=2)
-        self.wait(1)
+        self.play(ReplacementTransform(square, triangle), **self.run_time("transform"))
+        self.play(Rotate(triangle, angle=PI*2), **self.run_time("rotate"))
+        self.wait(pause)
 
         # [11-15s] 三角形分裂並消失
         dots = VGroup(*[Dot(triangle.get_vertices()[i], color=triangle.get_color()) for i in range(3)])
-        self.play(ReplacementTransform(triangle, dots))
-        self.play(FadeOut(dots), FadeOut(title), run_time=2)
-        self.wait(1)
+        self.play(ReplacementTransform(triangle, dots), **self.run_time("split"))
+        self.play(FadeOut(dots), FadeOut(title), **self.run_time("fade"))
+        self.wait(pause)
@@ -0,0 +1,147 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+# --- Per-Call Profiling for Manim Scenes ---
+# Mix ProfiledScene in ahead of Scene. Off unless SCENE_PROFILE is set to a CSV
+# path (or profile_path is set on the scene); when off, play() and wait() go
+# straight to Scene. Each row is one play/wait call: wall time, frames written,
+# time spent drawing with Cairo (renderer.update_frame) versus handing frames to
+# the movie writer (file_writer.write_frame), and the scene's size afterwards.
+COLUMNS = ("index", "kind", "line", "animations", "run_time", "wall_ms", "frames",
+           "cairo_ms", "write_ms", "other_ms", "mobjects", "family", "points")
+SORT_KEYS = ("index", "wall_ms", "frames", "cairo_ms", "write_ms", "other_ms", "mobjects", "family", "points")
+
+def _caller_line():
+    # First frame outside manim and this module: the line in construct() that made the call
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename != __file__ and f"{os.sep}manim{os.sep}" not in filename:
+            return f"{os.path.basename(filename)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return ""
+
+def _animation_name(anim):
+    name = type(anim).__name__
+    return "animate" if name == "_AnimationBuilder" else name
+
+class _Timed:
+    """Wraps a renderer method, adding its duration and call count to the scene's counters."""
+
+    def __init__(self, method, counters, name):
+        self.method = method
+        self.counters = counters
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return self.method(*args, **kwargs)
+        finally:
+            self.counters[self.name + "_ns"] += time.perf_counter_ns() - start
+            self.counters[self.name + "_calls"] += 1
+
+class ProfiledScene:
+    profile_path = os.environ.get("SCENE_PROFILE") or None
+
+    def render(self, *args, **kwargs):
+        if not self.profile_path:
+            return super().render(*args, **kwargs)
+        self.profile_rows = []
+        self._counters = {"cairo_ns": 0, "cairo_calls": 0, "write_ns": 0, "write_calls": 0}
+        renderer = self.renderer
+        renderer.update_frame = _Timed(renderer.update_frame, self._counters, "cairo")
+        renderer.file_writer.write_frame = _Timed(renderer.file_writer.write_frame, self._counters, "write")
+        finished = renderer.scene_finished
+        renderer.scene_finished = lambda scene: self._profiled("finish", [], finished, scene)
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            write_report(self.profile_rows, self.profile_path)
+            print_report(self.profile_rows, sort="wall_ms", top=10)
+
+    def play(self, *args, **kwargs):
+        if not self.profile_path:
+            return super().play(*args, **kwargs)
+        return self._profiled("play", [_animation_name(a) for a in args], super().play, *args, **kwargs)
+
+    def wait(self, *args, **kwargs):
+        if not self.profile_path:
+            return super().wait(*args, **kwargs)
+        return self._profiled("wait", [], super().wait, *args, **kwargs)
+
+    def _profiled(self, kind, animations, call, *args, **kwargs):
+        # Scene.pause / wait_until go through wait(); only the outermost call gets a row
+        if getattr(self, "_profiling", False):
+            return call(*args, **kwargs)
+        line = _caller_line() if kind != "finish" else ""
+        before = dict(self._counters)
+        self._profiling = True
+        start = time.perf_counter_ns()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            wall = time.perf_counter_ns() - start
+            self._profiling = False
+            delta = {k: self._counters[k] - before[k] for k in before}
+            family = self.get_mobject_family_members()
+            self.profile_rows.append({
+                "index": len(self.profile_rows),
+                "kind": kind,
+                "line": line,
+                "animations": "+".join(animations),
+                "run_time": round(getattr(self, "duration", 0) or 0, 3) if kind != "finish" else "",
+                "wall_ms": round(wall / 1e6, 3),
+                "frames": delta["write_calls"],
+                "cairo_ms": round(delta["cairo_ns"] / 1e6, 3),
+                "write_ms": round(delta["write_ns"] / 1e6, 3),
+                "other_ms": round((wall - delta["cairo_ns"] - delta["write_ns"]) / 1e6, 3),
+                "mobjects": len(self.mobjects),
+                "family": len(family),
+                "points": sum(len(getattr(m, "points", ())) for m in family),
+            })
+
+# --- Reports ---
+def write_report(rows, path):
+    """Writes profile rows as CSV (one row per call, in call order); returns the path."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+def read_report(path):
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        for key in SORT_KEYS:
+            row[key] = float(row[key]) if "." in row[key] else int(row[key])
+    return rows
+
+def print_report(rows, sort="wall_ms", top=None):
+    """Prints the rows ordered by a numeric column, largest first (call order for 'index')."""
+    ordered = sorted(rows, key=lambda r: r[sort], reverse=sort != "index")[:top]
+    total = sum(r["wall_ms"] for r in rows) or 1
+    print(f"{'#':>3} {'kind':<6} {'line':<22} {'wall ms':>9} {'share':>6} {'frames':>6} "
+          f"{'cairo ms':>9} {'write ms':>9} {'other ms':>9} {'mobj':>5} {'family':>6} {'points':>7}  animations")
+    for r in ordered:
+        print(f"{r['index']:>3} {r['kind']:<6} {r['line']:<22} {r['wall_ms']:>9.1f} {r['wall_ms'] / total:>6.1%} "
+              f"{r['frames']:>6} {r['cairo_ms']:>9.1f} {r['write_ms']:>9.1f} {r['other_ms']:>9.1f} "
+              f"{r['mobjects']:>5} {r['family']:>6} {r['points']:>7}  {r['animations']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show a scene profile written with SCENE_PROFILE, sorted by a column.")
+    parser.add_argument("report", help="CSV written by a ProfiledScene")
+    parser.add_argument("--sort", default="wall_ms", choices=SORT_KEYS)
+    parser.add_argument("--top", type=int, help="Only show the N largest rows")
+    args = parser.parse_args(argv)
+    print_report(read_report(args.report), args.sort, args.top)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import math
+import multiprocessing
+import os
+import traceback
+import numpy as np
+
+import instrument
+from flow_grid import FlowGridCache
+from instrument import set_frame, stage
+from particles import ParticleSystem
+from raster import draw_segments
+
+# --- Tile-Parallel Particle Canvas ---
+# The canvas is cut into a grid of tiles. Each tile owns its slice of the trail
+# canvas, its own flow grids and the particles currently inside it, and lives in
+# a worker process. A frame is two round trips:
+#   step:   adopt immigrants, fade, move particles, then hand back emigrants and
+#           the segments that reach into other tiles
+#   finish: draw the tile's segments together with the neighbours' border
+#           segments and return the tile's pixels
+# Rasterization happens in canvas coordinates (see raster.segment_pixels), so a
+# segment split over tiles covers exactly the pixels it would on one canvas and
+# the stitched frame has no seams. Dead particles respawn anywhere on the canvas
+# and move to the tile that owns the new spot, keeping the density uniform.
+
+def tile_edges(length, tile, cell):
+    """Tile boundaries along one axis; inner boundaries fall on flow grid cells."""
+    tile = max(cell, -(-tile // cell) * cell)
+    return list(range(0, length, tile)) + [length]
+
+def default_tile_size(width, height, tiles, cell):
+    """Tile size giving at least `tiles` roughly square tiles."""
+    cols = max(1, round(math.sqrt(tiles * width / height)))
+    rows = -(-tiles // cols)
+    return -(-width // cols), -(-height // rows)
+
+def _locate(edges, v):
+    return np.clip(np.searchsorted(edges, v, side="right") - 1, 0, len(edges) - 2)
+
+class FlowTile:
+    """One tile's canvas, flow grids and particles. Coordinates stay in canvas pixels."""
+
+    def __init__(self, index, xs, ys, config):
+        self.index = index
+        self.xs, self.ys = xs, ys
+        self.col, self.row = index % (len(xs) - 1), index // (len(xs) - 1)
+        self.x0, self.x1 = xs[self.col], xs[self.col + 1]
+        self.y0, self.y1 = ys[self.row], ys[self.row + 1]
+        self.config = config
+        cell = config["cell"]
+        w, h = self.x1 - self.x0, self.y1 - self.y0
+
+        self.canvas = np.empty((h, w, 3), dtype=np.float32)
+        self.canvas[:] = config["background"]
+        self.pixels = np.empty((h, w, 3), dtype=np.uint8)
+        # One extra cell on the far sides so bilinear lookups near the border see the next node
+        field = config["field"]
+        self.flow = FlowGridCache(lambda t: field(t, cell=cell, width=w + cell, height=h + cell,
+                                                  x0=self.x0, y0=self.y0),
+                                  config["period"], config["time_step"])
+        width, height = config["size"]
+        self.particles = ParticleSystem(config["counts"][index], width, height,
+                                        colorize=config["colorize"], seed=config["seeds"][index])
+
+    def owner(self, x, y):
+        return _locate(self.ys, y) * (len(self.xs) - 1) + _locate(self.xs, x)
+
+    def emigrants(self):
+        """Extracts every particle that now belongs to another tile, as (owners, state)."""
+        p = self.particles
+        owners = self.owner(p.x, p.y)
+        leaving = owners != self.index
+        return owners[leaving], p.extract(leaving)
+
+    def step(self, frame, immigrants):
+        c = self.config
+        if immigrants is not None:
+            self.particles.extend(immigrants)
+        with stage("background"):
+            self.canvas *= c["fade"]
+        with stage("simulate"):
+            ux, uy = self.flow.vectors(frame)
+            prev_x, prev_y = self.particles.update(ux, uy, c["cell"], bilinear=c["bilinear"],
+                                                   origin=(self.x0, self.y0))
+        with stage("shapes"):
+            # Segments are drawn in finish(), in one batch with the neighbours' border segments
+            p = self.particles
+            alpha = p.alpha()
+            visible = alpha > 0
+            self.segments = (prev_x[visible], prev_y[visible], p.x[visible], p.y[visible],
+                             p.color[visible], alpha[visible] / 255)
+            # Segments whose pixels reach past this tile; rint bounds every pixel they cover
+            x0, y0, x1, y1 = (np.rint(v) for v in self.segments[:4])
+            crossing = ((np.minimum(x0, x1) < self.x0) | (np.maximum(x0, x1) >= self.x1) |
+                        (np.minimum(y0, y1) < self.y0) | (np.maximum(y0, y1) >= self.y1))
+            return self.emigrants(), tuple(v[crossing] for v in self.segments)
+
+    def finish(self, segments):
+        c = self.config
+        with stage("shapes"):
+            batch = [np.concatenate(parts) for parts in zip(self.segments, *segments)]
+            draw_segments(self.canvas, *batch, mode=c["blend"], origin=(self.x0, self.y0))
+        with stage("convert"):
+            return np.clip(self.canvas, 0, 255, out=self.pixels, casting='unsafe')
+
+def _worker(conn, indices, xs, ys, config):
+    try:
+        tiles = [FlowTile(i, xs, ys, config) for i in indices]
+        conn.send({t.index: t.emigrants() for t in tiles})
+        while True:
+            message = conn.recv()
+            if message is None:
+                conn.send(instrument.drain())
+                return
+            op, frame, payload = message
+            set_frame(frame)
+            if op == "step":
+                conn.send({t.index: t.step(frame, payload.get(t.index)) for t in tiles})
+            else:
+                conn.send({t.index: t.finish(payload.get(t.index, [])) for t in tiles})
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+
+# --- Parent Side ---
+def _split_counts(total, xs, ys, width, height):
+    areas = [(x1 - x0) * (y1 - y0) for y0, y1 in zip(ys, ys[1:]) for x0, x1 in zip(xs, xs[1:])]
+    counts = [total * a // (width * height) for a in areas]
+    for i in range(total - sum(counts)):
+        counts[i % len(counts)] += 1
+    return counts
+
+def _route_particles(outgoing):
+    """{tile: (owners, state)} -> {tile: merged state of its immigrants}"""
+    incoming = {}
+    for owners, state in outgoing.values():
+        for target in np.unique(owners):
+            mask = owners == target
+            incoming.setdefault(int(target), []).append({k: v[mask] for k, v in state.items()})
+    return {t: {k: np.concatenate([s[k] for s in parts]) for k in parts[0]} for t, parts in incoming.items()}
+
+def _route_segments(borders, xs, ys):
+    """{tile: border segments} -> {tile: [segments drawn by other tiles that reach into it]}"""
+    cols = len(xs) - 1
+    incoming = {}
+    for source, (x0, y0, x1, y1, color, alpha) in borders.items():
+        if len(x0) == 0:
+            continue
+        c_lo = _locate(xs, np.rint(np.minimum(x0, x1)))
+        c_hi = _locate(xs, np.rint(np.maximum(x0, x1)))
+        r_lo = _locate(ys, np.rint(np.minimum(y0, y1)))
+        r_hi = _locate(ys, np.rint(np.maximum(y0, y1)))
+        for row in range(r_lo.min(), r_hi.max() + 1):
+            for col in range(c_lo.min(), c_hi.max() + 1):
+                target = row * cols + col
+                if target == source:
+                    continue
+                mask = (c_lo <= col) & (col <= c_hi) & (r_lo <= row) & (row <= r_hi)
+                if mask.any():
+                    incoming.setdefault(target, []).append(
+                        (x0[mask], y0[mask], x1[mask], y1[mask], color[mask], alpha[mask]))
+    return incoming
+
+def _exchange(conns, op, frame, payload):
+    for conn, indices in conns:
+        conn.send((op, frame, {i: payload[i] for i in indices if i in payload}))
+    return _receive(conns)
+
+def _receive(conns):
+    results = {}
+    for conn, _ in conns:
+        reply = conn.recv()
+        if isinstance(reply, tuple) and reply and reply[0] == "error":
+            raise RuntimeError(f"Tile worker failed:\n{reply[1]}")
+        results.update(reply)
+    return results
+
+def imap_tiled_frames(frames, size, particle_count, config, tile_size=None, workers=0):
+    """
+    Yields frames as (H, W, 3) uint8 arrays, simulated tile by tile in worker
+    processes (0 workers means one per CPU; tiles are dealt round-robin). config
+    holds field, cell, period, time_step, bilinear, blend, fade, background,
+    colorize and seed, as used by flow_field_gen. Each worker only ever holds its own tiles,
+    so memory per worker follows the tile size, not the canvas size. The yielded
+    array is reused for the next frame.
+    """
+    width, height = size
+    workers = workers or os.cpu_count() or 1
+    tw, th = tile_size or default_tile_size(width, height, workers, config["cell"])
+    xs, ys = tile_edges(width, tw, config["cell"]), tile_edges(height, th, config["cell"])
+    n_tiles = (len(xs) - 1) * (len(ys) - 1)
+    seeds = np.random.SeedSequence(config.get("seed")).spawn(n_tiles)
+    config = dict(config, size=size, counts=_split_counts(particle_count, xs, ys, width, height), seeds=seeds)
+
+    groups = [list(range(n_tiles))[w::workers] for w in range(min(workers, n_tiles))]
+    conns, procs = [], []
+    for indices in groups:
+        parent, child = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=_worker, args=(child, indices, xs, ys, config), daemon=True)
+        proc.start()
+        conns.append((parent, indices))
+        procs.append(proc)
+
+    canvas = np.empty((height, width, 3), dtype=np.uint8)
+    try:
+        immigrants = _route_particles(_receive(conns))
+        for f in range(frames):
+            set_frame(f)
+            stepped = _exchange(conns, "step", f, immigrants)
+            with stage("exchange"):
+                immigrants = _route_particles({i: r[0] for i, r in stepped.items()})
+                borders = _route_segments({i: r[1] for i, r in stepped.items()}, xs, ys)
+            pixels = _exchange(conns, "finish", f, borders)
+            with stage("stitch"):
+                for i, tile in pixels.items():
+                    col, row = i % (len(xs) - 1), i // (len(xs) - 1)
+                    canvas[ys[row]:ys[row + 1], xs[col]:xs[col + 1]] = tile
+            yield canvas
+        for conn, _ in conns:
+            conn.send(None)
+        for conn, _ in conns:
+            instrument.merge(conn.recv())
+    finally:
+        for proc in procs:
+            proc.join(timeout=1)
+            if proc.is_alive():
+                proc.terminate()